@@ -1,8 +1,27 @@
 # pylint: disable=W0621
-import base64
+import bisect
+import collections
+import contextlib
+import copy
+import re
 import sys
+import threading
 
-from six.moves import configparser
+import six
+
+# base64, configparser, hashlib, json and pickle are imported where they
+# are used, so that importing oscar.flag stays cheap for tools that never
+# read ini files, secure settings or snapshots.
+
+try:
+    import contextvars
+except ImportError:  # Python < 3.7
+    contextvars = None
+
+try:
+    from types import MappingProxyType
+except ImportError:  # Python 2
+    MappingProxyType = dict
 
 
 class _Required(object):
@@ -13,6 +32,35 @@ class _Required(object):
 REQUIRED = _Required()
 UNSET = object()
 INDENT = '    '
+SNAPSHOT_MAGIC = b'OFLAGSNAP1'
+_INTERPOLATION_RE = re.compile(r'\$\{([^}]+)\}')
+
+
+class _ThreadLocalVar(object):
+
+    '''Minimal :class:`contextvars.ContextVar` stand-in for old Pythons.'''
+
+    def __init__(self):
+        self._local = threading.local()
+
+    def get(self):
+        return getattr(self._local, 'value', None)
+
+    def set(self, value):
+        token = self.get()
+        self._local.value = value
+        return token
+
+    def reset(self, token):
+        self._local.value = token
+
+
+# Maps Var -> overriding value for the current context, or None when no
+# overrides are active so reads only pay for a single lookup.
+if contextvars is not None:
+    _OVERRIDES = contextvars.ContextVar('oscar.flag.overrides', default=None)
+else:
+    _OVERRIDES = _ThreadLocalVar()
 
 
 def default_usage(globalflags):
@@ -49,14 +97,373 @@ class GlobalFlagSet(object):
         self.usage_long = usage_long
         self.namespace_flags = dict()
         self.args = []
+        # Serializes namespace creation and updates of the indexes below
+        # while flags are declared, e.g. by modules imported in parallel.
+        # Reading flags and indexes doesn't take it.
+        self._lock = threading.Lock()
+        # Indexes maintained as flags are declared: qualified name -> Var,
+        # short name -> namespaces declaring it, and the qualified names
+        # in sorted order (rebuilt lazily) for prefix queries.
+        self._qualified = dict()
+        self._short = dict()
+        self._sorted_qualified = None
+        # All (namespace, name, flag) sorted, rebuilt after declarations.
+        self._sorted_flags = None
+        # Required flags: Var -> (namespace, name), and those still unset.
+        self._required = dict()
+        self._unset_required = dict()
+        # Derived flags: Var -> qualified name of every flag, qualified
+        # name -> Derived, and qualified name -> names of the Derived
+        # flags depending on it.
+        self._names = dict()
+        self._derived = dict()
+        self._dependents = dict()
+        self.frozen = False
+        # Incremented whenever a flag is declared, set or unset through
+        # this flag set, so consumers can tell whether values changed.
+        self.generation = 0
+        self._listeners = []
+        # Flags still shared with the flag set this was cloned from.
+        self._shared = set()
+        # Derived results that can't go stale once frozen.
+        self._frozen_cache = dict()
+        # Set by offload_descriptions().
+        self._description_table = None
 
     def namespace(self, namespace):
         '''Returns a :class:`NamespaceFlagSet` associated with ``namespace``.
 
         :type namespace: str
         :rtype: NamespaceFlagSet
+        :raises FlagException: if frozen and ``namespace`` doesn't exist
+        '''
+        flagset = self.namespace_flags.get(namespace)
+        if flagset is None:
+            with self._lock:
+                flagset = self.namespace_flags.get(namespace)
+                if flagset is None:
+                    self._check_not_frozen()
+                    flagset = self.namespace_flags[namespace] = NamespaceFlagSet(
+                        namespace, self)
+        return flagset
+
+    def clone(self):
+        '''Returns a copy-on-write copy of this flag set.
+
+        The clone shares all flag declarations, and a flag is only
+        copied when it is first set or unset through the clone, so
+        cloning costs a few dict copies regardless of how the flags
+        were parsed. Neither flag set sees the other's later changes.
+        Flags keeping state outside themselves (see
+        :attr:`Var.shared_state`), such as the bits of a
+        :class:`~oscar.flag.contrib.BoolGroup` or logger levels, can't
+        be copied and raise :exc:`FlagException` when set or unset
+        through the clone. Values set by calling :meth:`Var.set`
+        directly on a shared flag are seen by both. Overrides from
+        :func:`override` apply to a flag and its copies alike. The clone
+        is not frozen.
+
+        :rtype: GlobalFlagSet
+        '''
+        clone = GlobalFlagSet(self.usage, self.usage_long)
+        with self._lock:
+            for namespace, flagset in self.namespace_flags.items():
+                copied = clone.namespace_flags[namespace] = NamespaceFlagSet(namespace, clone)
+                copied._flags.update(flagset._flags)
+                copied._pending.update(flagset._pending)
+            clone.args = list(self.args)
+            clone._qualified = dict(self._qualified)
+            clone._short = dict((name, list(namespaces))
+                                for name, namespaces in self._short.items())
+            clone._names = dict((flag, qualified) for qualified, flag in self._qualified.items())
+            clone._required = dict(self._required)
+            clone._unset_required = dict(self._unset_required)
+            clone._dependents = dict((name, list(dependents))
+                                     for name, dependents in self._dependents.items())
+            clone._shared = set(self._qualified.values())
+            clone._description_table = self._description_table
+            for qualified, derived in self._derived.items():
+                copied = copy.copy(derived)
+                copied.globalflags, copied.memo = clone, UNSET
+                clone._shared.discard(derived)
+                clone._replace(qualified, derived, copied)
+                clone._derived[qualified] = copied
+        return clone
+
+    def _writable(self, flag):
+        '''Return the flag to modify for ``flag``, copying it if shared with a clone source.
+
+        :type flag: Var
+        :rtype: Var
+        :raises FlagException: if ``flag`` is shared and has :attr:`~Var.shared_state`
+        '''
+        if flag not in self._shared:
+            return flag
+        with self._lock:
+            qualified = self._names[flag]
+            if flag in self._shared:
+                if flag.shared_state:
+                    raise FlagException(
+                        'cannot set %s in a clone: its state is shared' % qualified)
+                copied = copy.copy(flag)
+                copied.origin = flag.origin or flag
+                self._shared.discard(flag)
+                self._replace(qualified, flag, copied)
+            return self._qualified[qualified]
+
+    def _replace(self, qualified, old, new):
+        '''Replace flag ``old`` named ``qualified`` by ``new`` in all indexes.'''
+        namespace, name = qualified.rsplit('.', 1)
+        self.namespace_flags[namespace]._flags[name] = new
+        self._qualified[qualified] = new
+        self._names[new] = qualified
+        if old in self._required:
+            self._required[new] = self._required.pop(old)
+        if old in self._unset_required:
+            self._unset_required[new] = self._unset_required.pop(old)
+        self._sorted_flags = None
+
+    def _adopt(self, source):
+        '''Make the namespaces of ``source`` act as this clone's namespaces.
+
+        :type source: GlobalFlagSet
+        :returns: the namespaces' previous state, for :meth:`_release`
+        '''
+        saved = []
+        for namespace, flagset in source.namespace_flags.items():
+            copied = self.namespace_flags[namespace]
+            saved.append((flagset, flagset._flags, flagset._pending, flagset._globalflags,
+                          flagset._frozen))
+            flagset.__dict__['_flags'] = copied._flags
+            object.__setattr__(flagset, '_pending', copied._pending)
+            object.__setattr__(flagset, '_globalflags', self)
+            object.__setattr__(flagset, '_frozen', None)
+            self.namespace_flags[namespace] = flagset
+        return saved
+
+    @staticmethod
+    def _release(saved):
+        '''Restore namespaces adopted by :meth:`_adopt`.'''
+        for flagset, flags, pending, globalflags, frozen in saved:
+            flagset.__dict__['_flags'] = flags
+            object.__setattr__(flagset, '_pending', pending)
+            object.__setattr__(flagset, '_globalflags', globalflags)
+            object.__setattr__(flagset, '_frozen', frozen)
+
+    def freeze(self):
+        '''Make all flags read-only.
+
+        Afterwards, setting or unsetting flags through a
+        :class:`NamespaceFlagSet` or the parsers, declaring flags and
+        creating namespaces raise :exc:`FlagException`. Each namespace's
+        values are precomputed into an immutable :meth:`view`, and help
+        text, :meth:`check_required` and :meth:`fingerprint` are
+        computed once. Values set by calling :meth:`Var.set` directly
+        are not seen by a frozen flag set. Overrides from
+        :func:`override` still apply. Derived flags that can't be
+        computed yet are left out of the views and raise when read.
+        '''
+        # Build every view before publishing any, so nothing is frozen
+        # if building one fails.
+        views = [(flagset, flagset._frozen_view())
+                 for flagset in list(self.namespace_flags.values())]
+        for flagset, view in views:
+            object.__setattr__(flagset, '_frozen', view)
+        self.frozen = True
+
+    def view(self, namespace):
+        '''Returns an immutable mapping of flag names to values for a frozen flag set.
+
+        Flags holding a :class:`SecureValue` are left out, so they stay
+        encoded until read through the namespace.
+
+        :type namespace: str
+        :rtype: types.MappingProxyType
+        :raises FlagException: if not frozen
+        :raises KeyError: if the namespace is not found
+        '''
+        if not self.frozen:
+            raise FlagException('flags are not frozen')
+        return self.namespace_flags[namespace]._frozen
+
+    def _check_not_frozen(self):
+        if self.frozen:
+            raise FlagException('flags are frozen')
+
+    def _cached(self, key, compute):
+        '''Return ``compute()``, computed only once when frozen.'''
+        if not self.frozen:
+            return compute()
+        try:
+            return self._frozen_cache[key]
+        except KeyError:
+            result = self._frozen_cache[key] = compute()
+            return result
+
+    def _declared(self, namespace, name, flag):
+        '''Index a flag newly declared in ``namespace``.
+
+        :type namespace: str
+        :type name: str
+        :type flag: Var
+        :raises FlagException: if ``flag`` is :class:`Derived` and depends on itself
+        '''
+        qualified = '%s.%s' % (namespace, name)
+        with self._lock:
+            if isinstance(flag, Derived):
+                self._declared_derived(namespace, qualified, flag)
+            self._qualified[qualified] = flag
+            self._names[flag] = qualified
+            self._short.setdefault(name, []).append(namespace)
+            self._sorted_qualified = None
+            self._sorted_flags = None
+            self.generation += 1
+            if flag.default is REQUIRED:
+                self._required[flag] = (namespace, name)
+                self._index_required(flag)
+            if flag.secure and qualified in self._dependents:
+                self._propagate_secure(qualified)
+
+    def _declared_derived(self, namespace, qualified, flag):
+        '''Resolve the dependencies of a :class:`Derived` flag and index them.
+
+        :type namespace: str
+        :type qualified: str
+        :type flag: Derived
+        :raises FlagException: on a dependency cycle
+        '''
+        depends = [name if '.' in name else '%s.%s' % (namespace, name)
+                   for name in flag.depends]
+        stack, seen = list(depends), set()
+        while stack:
+            name = stack.pop()
+            if name == qualified:
+                raise FlagException('%s depends on itself' % qualified)
+            if name not in seen and name in self._derived:
+                seen.add(name)
+                stack.extend(self._derived[name].depends)
+        flag.depends = depends
+        flag.globalflags = self
+        flag.secure = flag.secure or any(
+            self._qualified[name].secure for name in depends if name in self._qualified)
+        self._derived[qualified] = flag
+        for name in depends:
+            self._dependents.setdefault(name, []).append(qualified)
+
+    def _changed(self, flag):
+        '''Update indexes after ``flag`` was set or unset.
+
+        :type flag: Var
+        '''
+        self.generation += 1
+        if self._dependents:
+            self._invalidate(self._names.get(flag))
+            if flag.secure:
+                self._propagate_secure(self._names.get(flag))
+        if flag in self._required:
+            self._index_required(flag)
+        if self._listeners:
+            qualified = self._names.get(flag)
+            if qualified is not None:
+                namespace, name = qualified.rsplit('.', 1)
+                for listener in list(self._listeners):
+                    listener(namespace, name, flag)
+
+    def _index_required(self, flag):
+        '''Track whether the required ``flag`` is unset.
+
+        :type flag: Var
+        '''
+        if flag.is_set():
+            self._unset_required.pop(flag, None)
+        else:
+            self._unset_required[flag] = self._required[flag]
+
+    def add_listener(self, listener):
+        '''Call ``listener`` whenever a flag is set or unset through this flag set.
+
+        Listeners are called with the flag's namespace, name and
+        :class:`Var` in the thread making the change, and should return
+        quickly. Declaring a flag doesn't call them; restoring a value
+        held for a flag until its declaration does.
+
+        :type listener: F(str, str, Var)
+        '''
+        self._listeners.append(listener)
+
+    def remove_listener(self, listener):
+        '''Stop calling ``listener``.
+
+        :type listener: F(str, str, Var)
+        :raises ValueError: if ``listener`` was not added
+        '''
+        self._listeners.remove(listener)
+
+    def _invalidate(self, name):
+        '''Drop the memoized values of :class:`Derived` flags depending on ``name``.
+
+        :type name: str
+        '''
+        stack = list(self._dependents.get(name, ()))
+        while stack:
+            name = stack.pop()
+            derived = self._derived[name]
+            if derived.memo is not UNSET:
+                derived.memo = UNSET
+                stack.extend(self._dependents.get(name, ()))
+
+    def _propagate_secure(self, name):
+        '''Mark :class:`Derived` flags depending on the secure flag ``name`` secure.
+
+        :type name: str
+        '''
+        stack = list(self._dependents.get(name, ()))
+        while stack:
+            name = stack.pop()
+            derived = self._derived[name]
+            if not derived.secure:
+                derived.secure = True
+                stack.extend(self._dependents.get(name, ()))
+
+    def _lookup(self, name):
+        '''Return the flag for a qualified or non-ambiguous short ``name``.
+
+        :type name: str
+        :rtype: Var
+        :raises KeyError: if the flag is not found or ambiguous
+        '''
+        flag = self._qualified.get(name)
+        if flag is None:
+            if '.' in name:
+                raise KeyError(name)
+            flag = self.get(self.find_short(name), name)
+        return flag
+
+    def find_prefix(self, prefix):
+        '''Find all flags in namespace ``prefix`` and namespaces below it.
+
+        E.g. ``'company.service'`` (or ``'company.service.*'``) matches
+        flags in ``company.service`` and ``company.service.subsystem``,
+        but not ``company.services``.
+
+        :type prefix: str
+        :rtype: list[tuple(str, str, Var)]
+        :returns: ``(namespace, name, flag)`` sorted by qualified name
         '''
-        return self.namespace_flags.setdefault(namespace, NamespaceFlagSet())
+        if prefix.endswith('.*'):
+            prefix = prefix[:-2]
+        prefix += '.'
+        keys = self._sorted_qualified
+        if keys is None:
+            with self._lock:
+                keys = self._sorted_qualified = sorted(self._qualified)
+        matches = []
+        for i in range(bisect.bisect_left(keys, prefix), len(keys)):
+            if not keys[i].startswith(prefix):
+                break
+            namespace, name = keys[i].rsplit('.', 1)
+            matches.append((namespace, name, self._qualified[keys[i]]))
+        return matches
 
     def get(self, namespace, flag):
         '''get the flag object associated with ``flag`` in ``namespace``.
@@ -78,10 +485,7 @@ class GlobalFlagSet(object):
         :rtype: str
         :raises KeyError: if the flag is not found or ambiguous
         '''
-        matches = []
-        for namespace, flagset in self.namespace_flags.items():
-            if flag in flagset._flags:
-                matches.append(namespace)
+        matches = self._short.get(flag, ())
         if len(matches) > 1:
             raise KeyError('ambiguous flag \'%s\' in namespaces %s' % (flag, matches))
         if len(matches) == 0:
@@ -94,6 +498,22 @@ class GlobalFlagSet(object):
         :type out: file
         :type namespace: str
         '''
+        if self._description_table is None:
+            out.write(self._cached(('help', namespace), lambda: self._format_flags(namespace)))
+            return
+        # Caching the help text would keep offloaded descriptions resident.
+        with self._description_table:
+            out.write(self._format_flags(namespace))
+
+    def _format_flags(self, namespace):
+        '''Returns the usage of flags in ``namespace``.
+
+        :type namespace: str
+        :rtype: str
+        '''
+        if self.frozen and namespace not in self.namespace_flags:
+            return ''
+        out = six.StringIO()
         for name, var in sorted(self.namespace(namespace)._flags.items()):
             try:
                 _ = self.find_short(name)
@@ -106,16 +526,70 @@ class GlobalFlagSet(object):
             if hasattr(var, 'long_description'):
                 for line in var.long_description.splitlines():
                     out.write(INDENT + INDENT + line + '\n')
+        return out.getvalue()
 
     def write_flags_long(self, out):
         '''Prints all flag usage to ``out``.
 
         :type out: file
         '''
-        for namespace in sorted(self.namespace_flags):
-            out.write('%s:\n' % namespace)
-            self.write_flags(out, namespace)
-            out.write('\n')
+        with self._descriptions_loaded():
+            for namespace in sorted(self.namespace_flags):
+                out.write('%s:\n' % namespace)
+                self.write_flags(out, namespace)
+                out.write('\n')
+
+    def _descriptions_loaded(self):
+        '''Returns a context manager keeping offloaded descriptions loaded.'''
+        return self._description_table or _NO_TABLE
+
+    def offload_descriptions(self, path):
+        '''Move the descriptions of all declared flags to a file at ``path``.
+
+        Descriptions are only needed for help text, but with thousands of
+        flags in many worker processes they add up. Afterwards
+        :attr:`Var.description` reads them back from ``path``; help text
+        reads the file once per :meth:`write_flags` or
+        :meth:`write_flags_long` call and is no longer cached when
+        frozen. Flags declared later keep their description in memory
+        until this is called again, which moves all descriptions to the
+        new ``path``. The file must stay in place while descriptions may
+        be read.
+
+        :type path: str
+        :rtype: DescriptionTable
+        '''
+        with self._lock:
+            flags = list(self._qualified.items())
+        table = DescriptionTable(path, dict(
+            (qualified, flag.description) for qualified, flag in flags))
+        for qualified, flag in flags:
+            flag._offload_description(table, qualified)
+        self._description_table = table
+        return table
+
+    def iter_flags(self):
+        '''Iterate over all flags, sorted by namespace and name.
+
+        The sorted order is cached until another flag is declared.
+
+        :rtype: iterator[tuple(str, str, Var)]
+        '''
+        flags = self._sorted_flags
+        if flags is None:
+            with self._lock:
+                flags = self._sorted_flags = sorted(
+                    (tuple(qualified.rsplit('.', 1)) + (flag,)
+                     for qualified, flag in self._qualified.items()),
+                    key=lambda entry: entry[:2])
+        return iter(flags)
+
+    def iter_set_flags(self):
+        '''Iterate over all *set* flags, sorted by namespace and name.
+
+        :rtype: iterator[tuple(str, str, Var)]
+        '''
+        return (entry for entry in self.iter_flags() if entry[2].is_set())
 
     def visit(self, func):
         '''Walk all *set* flags, calling ``func`` on each.
@@ -123,10 +597,8 @@ class GlobalFlagSet(object):
         :type func: F(str, str, Var)
         :param func: visiting function
         '''
-        for namespace in sorted(self.namespace_flags):
-            for name, flag in sorted(self.namespace(namespace)._flags.items()):
-                if flag.is_set():
-                    func(namespace, name, flag)
+        for namespace, name, flag in self.iter_set_flags():
+            func(namespace, name, flag)
 
     def visit_all(self, func):
         '''Walk all flags, calling ``func`` on each.
@@ -134,23 +606,161 @@ class GlobalFlagSet(object):
         :type func: F(str, str, Var)
         :param func: visiting function
         '''
-        for namespace in sorted(self.namespace_flags):
-            for name, flag in sorted(self.namespace(namespace)._flags.items()):
-                func(namespace, name, flag)
+        for namespace, name, flag in self.iter_flags():
+            func(namespace, name, flag)
 
-    def check_required(self):
+    def check_required(self, sort=True):
         '''Returns a list of ``(namespace, name, flag)`` of all unset, required flags.
 
+        Only required flags that are unset are examined, so this is cheap
+        regardless of the number of flags.
+
+        :type sort: bool
+        :param sort: sort by namespace and name; pass ``False`` if the
+            order doesn't matter
         :rtype: list[tuple(str, str, Var)]
         '''
-        nonset = []
+        nonset = list(self._cached('required', self._check_required))
+        if sort:
+            nonset.sort(key=lambda entry: entry[:2])
+        return nonset
 
-        def _check(namespace, name, flag):
-            if flag.default is REQUIRED and not flag.is_set():
+    def _check_required(self):
+        nonset = []
+        for flag, (namespace, name) in list(self._unset_required.items()):
+            if flag.is_set():
+                # Set through Var.set rather than the flag set.
+                del self._unset_required[flag]
+            else:
                 nonset.append((namespace, name, flag))
-        self.visit_all(_check)
         return nonset
 
+    def fingerprint(self):
+        '''Returns a digest identifying the declared flags and their types.
+
+        Two flag sets with the same namespaces, flag names and flag
+        types have the same fingerprint.
+
+        :rtype: str
+        '''
+        return self._cached('fingerprint', self._fingerprint)
+
+    def _fingerprint(self):
+        import hashlib
+
+        digest = hashlib.sha1()
+
+        def _add(namespace, name, flag):
+            digest.update(('%s.%s:%s\n' % (namespace, name, flag.type_str)).encode('utf-8'))
+        self.visit_all(_add)
+        return digest.hexdigest()
+
+    def _set_entries(self, namespaces=None):
+        '''Returns ``(namespace, name, secure, data)`` for all *set* flags.
+
+        :type namespaces: None or list[str]
+        :param namespaces: only include flags in these namespaces
+        :rtype: list[tuple(str, str, bool, object)]
+        '''
+        if namespaces is not None:
+            namespaces = set(namespaces)
+        return [(namespace, name, flag.secure, flag.serialize())
+                for namespace, name, flag in self.iter_set_flags()
+                if namespaces is None or namespace in namespaces]
+
+    def export_snapshot(self, file_p):
+        '''Write all *set* flag values to a binary snapshot in ``file_p``.
+
+        Values are produced by each flag's :meth:`Var.serialize`, so
+        :meth:`import_snapshot` restores them without string
+        coercion. Values of ``secure`` flags are base64 encoded rather
+        than stored alongside the plain values, which keeps them out of
+        casual view but is not encryption: the file must not be
+        readable by other users.
+
+        :type file_p: file
+        '''
+        import base64
+        from six.moves import cPickle as pickle
+
+        entries = []
+        for namespace, name, secure, data in self._set_entries():
+            if secure:
+                data = base64.b64encode(pickle.dumps(data, pickle.HIGHEST_PROTOCOL))
+            entries.append((namespace, name, secure, data))
+        file_p.write(SNAPSHOT_MAGIC)
+        file_p.write(pickle.dumps((self.fingerprint(), entries), pickle.HIGHEST_PROTOCOL))
+
+    def import_snapshot(self, file_p):
+        '''Restore flag values from a snapshot written by :meth:`export_snapshot`.
+
+        The snapshot must have been exported from a flag set with the
+        same declared flags, so it should be imported after all flag
+        declaring modules are imported. Snapshots are pickled, and
+        importing one can run arbitrary code: only import snapshots
+        written by a trusted process, from a location other users
+        can't write to.
+
+        :type file_p: file
+        :raises ParseException: if ``file_p`` is not a snapshot
+        :raises FlagException: if the declared flags differ from the snapshot's
+        '''
+        import base64
+        from six.moves import cPickle as pickle
+
+        self._check_not_frozen()
+        data = file_p.read()
+        if not data.startswith(SNAPSHOT_MAGIC):
+            raise ParseException('not a flag snapshot')
+        fingerprint, entries = pickle.loads(data[len(SNAPSHOT_MAGIC):])
+        if fingerprint != self.fingerprint():
+            raise FlagException('snapshot does not match declared flags')
+        for namespace, name, secure, data in entries:
+            flag = self._writable(self.get(namespace, name))
+            if secure:
+                data = pickle.loads(base64.b64decode(data))
+                flag.secure = True
+            flag.deserialize(data)
+            self._changed(flag)
+
+    def dump_values(self, namespaces=None):
+        '''Returns the values of all *set* flags as a compact byte string.
+
+        Unlike :meth:`export_snapshot`, the result is meant to be handed
+        to another process of the same program (e.g. as a process pool
+        initializer argument) and is restored with :meth:`load_values`.
+
+        :type namespaces: None or list[str]
+        :param namespaces: only include flags in these namespaces
+        :rtype: bytes
+        '''
+        from six.moves import cPickle as pickle
+
+        return pickle.dumps(self._set_entries(namespaces), pickle.HIGHEST_PROTOCOL)
+
+    def load_values(self, data, aliases=None):
+        '''Restore flag values produced by :meth:`dump_values` in one batch.
+
+        Values for flags that are not declared yet are held by their
+        namespace and applied when the flag is declared, so this can
+        run before flag declaring modules are imported.
+
+        :type data: bytes
+        :type aliases: None or dict[str, str]
+        :param aliases: namespaces to restore values to instead, for
+            flags not declared in their original namespace
+        '''
+        from six.moves import cPickle as pickle
+
+        self._check_not_frozen()
+        aliases = aliases or {}
+        for namespace, name, secure, value in pickle.loads(data):
+            if namespace in aliases:
+                flagset = self.namespace_flags.get(namespace)
+                if flagset is None or name not in flagset._flags:
+                    namespace = aliases[namespace]
+            self.namespace(namespace)._restore(name, secure, value)
+
     def parse_commandline(self, args):
         '''Parse a commandline into flags and arguments.
 
@@ -164,6 +774,15 @@ class GlobalFlagSet(object):
         :raises KeyError: on unknown flag
         :raises ParseException: on invalid command-line syntax
         '''
+        self._parse_commandline(args, None)
+
+    def _parse_commandline(self, args, report):
+        '''Parse a commandline, raising errors or adding them to ``report``.
+
+        :type args: list(str)
+        :type report: None or ValidationReport
+        '''
+        self._check_not_frozen()
         self.args = args
         while len(self.args):
             arg = self.args[0]
@@ -178,7 +797,10 @@ class GlobalFlagSet(object):
                     break
             name = arg[num_minuses:]
             if len(name) == 0 or name[0] == '-' or name[0] == '=':
-                raise ParseException('bad flag syntax: %s' % arg)
+                self._report(report, 'malformed', 'commandline', arg,
+                             ParseException('bad flag syntax: %s' % arg))
+                self.args = self.args[1:]
+                continue
             self.args = self.args[1:]
             has_value = False
             value = ''
@@ -192,24 +814,55 @@ class GlobalFlagSet(object):
                 self.usage(self)
             if name == 'helplong':
                 self.usage_long(self)
-            if '.' not in name:
-                namespace = self.find_short(name)
-            else:
-                parts = name.split('.')
-                namespace, name = '.'.join(parts[:-1]), parts[-1]
-            flag = self.get(namespace, name)
+            try:
+                flag = self._lookup(name)
+            except KeyError as exc:
+                self._report_key_error(report, 'commandline', name, exc)
+                # Assume a following non-flag argument is the unknown flag's value.
+                if not has_value and self.args and not self.args[0].startswith('-'):
+                    self.args = self.args[1:]
+                continue
             if isinstance(flag, Bool):
-                if has_value:
-                    flag.set(value)
-                else:
-                    flag.set('True')
+                if not has_value:
+                    value = 'True'
             else:
                 if not has_value and len(self.args) > 0:
                     has_value = True
                     value, self.args = self.args[0], self.args[1:]
                 if not has_value:
-                    raise ParseException('flag needs an argument: %s' % name)
-                flag.set(value)
+                    self._report(report, 'malformed', 'commandline', name,
+                                 ParseException('flag needs an argument: %s' % name))
+                    continue
+            self._set_reported(report, 'commandline', name, flag, value)
+
+    def _report(self, report, kind, source, name, exc):
+        '''Raise ``exc`` or, when validating, add it to ``report``.'''
+        if report is None:
+            raise exc
+        report.add(kind, source, name, str(exc))
+
+    def _report_key_error(self, report, source, name, exc):
+        '''Report a :exc:`KeyError` from :meth:`_lookup` or :meth:`get`.'''
+        if report is None:
+            raise exc
+        if len(self._short.get(name, ())) > 1:
+            report.add('ambiguous', source, name, exc.args[0])
+        else:
+            report.add('unknown', source, name, 'unknown flag: %s' % name)
+
+    def _set_reported(self, report, source, name, flag, value):
+        '''Set ``flag``, reporting invalid values when validating.'''
+        flag = self._writable(flag)
+        if report is None:
+            flag.set(value)
+            self._changed(flag)
+            return
+        try:
+            flag.set(value)
+        except (ValueError, TypeError, FlagException) as exc:
+            report.add('malformed', source, name, 'invalid value %r: %s' % (value, exc))
+        else:
+            self._changed(flag)
 
     def parse_environment(self, args):
         '''Parse environment variable tuples.
@@ -218,32 +871,86 @@ class GlobalFlagSet(object):
           >>> import os
           >>> flag.parse_environment(os.environ.items())
 
-        Recognizes `SECURED_SETTING_` prefixed flags, translates from
-        base64 and maps to the short name. `secure` is also set to
-        `True` on the underlying flag object, which should be
-        respected by users of :meth:`visit` and :meth:`visit_all`.
+        Recognizes `SECURED_SETTING_` prefixed flags and maps them to
+        the short name. Their values are checked once, then kept base64
+        encoded in a :class:`SecureValue` and decoded again whenever the
+        flag is read. Decoded values are passed to the flag as text,
+        except for :class:`String` flags, which hold bytes. `secure`
+        is also set to `True` on the underlying flag object, which
+        should be respected by users of :meth:`visit` and
+        :meth:`visit_all`.
+
+        :type args: list[tuple(str, str)]
+        '''
+        self._parse_environment(args, None)
+
+    def _parse_environment(self, args, report):
+        '''Parse environment variables, raising errors or adding them to ``report``.
+
+        Unknown names are ignored either way.
 
         :type args: list[tuple(str, str)]
+        :type report: None or ValidationReport
         '''
+        self._check_not_frozen()
         for name, value in args:
             # First treat SECURED_SETTING_ values specially.
             secure = False
             if name.startswith('SECURED_SETTING_'):
                 name = name[len('SECURED_SETTING_'):]
-                value = base64.b64decode(value)
                 secure = True
             try:
-                if '.' not in name:
-                    namespace = self.find_short(name)
-                else:
-                    parts = name.split('.')
-                    namespace, name = '.'.join(parts[:-1]), parts[-1]
-                flag = self.get(namespace, name)
-                flag.set(value)
-                flag.secure = flag.secure or secure
-            except KeyError:
+                flag = self._lookup(name)
+            except KeyError as exc:
                 # Ignore environment variables that don't map to a setting.
-                pass
+                if report is not None and len(self._short.get(name, ())) > 1:
+                    report.add('ambiguous', 'environment', name, exc.args[0])
+                continue
+            flag = self._writable(flag)
+            flag.secure = flag.secure or secure
+            if secure and flag.secure_lazily:
+                if self._check_secure(report, name, flag, value):
+                    flag.value = SecureValue(value)
+                    self._changed(flag)
+            elif secure:
+                self._set_secure_eagerly(report, name, flag, value)
+            else:
+                self._set_reported(report, 'environment', name, flag, value)
+
+    def _check_secure(self, report, name, flag, value):
+        '''Decode and coerce a secure ``value`` once, raising or reporting it if malformed.
+
+        Nothing decoded is kept, and the error doesn't include the value.
+
+        :rtype: bool
+        '''
+        import base64
+
+        try:
+            buffer = bytearray(base64.b64decode(value))
+            try:
+                flag.coerce_value(flag._decode_secure(bytes(buffer)))
+            finally:
+                buffer[:] = bytearray(len(buffer))
+        except (ValueError, TypeError, FlagException):
+            self._report(report, 'malformed', 'environment', name, ValueError(
+                'invalid secure value for %s flag' % flag.type_str))
+            return False
+        return True
+
+    def _set_secure_eagerly(self, report, name, flag, value):
+        '''Decode and set a secure ``value`` for a flag that can't hold a :class:`SecureValue`.'''
+        import base64
+
+        try:
+            flag.set(flag._decode_secure(base64.b64decode(value)))
+        except (ValueError, TypeError, FlagException):
+            if report is None:
+                raise
+            report.add('malformed', 'environment', name,
+                       'invalid secure value for %s flag' % flag.type_str)
+            return
+        self._changed(flag)
 
     def parse_ini(self, file_p):
         '''Parse a :mod:`ConfigParser` compatible file object.
@@ -260,31 +967,167 @@ class GlobalFlagSet(object):
 
         :type file_p: file
         '''
+        self._parse_ini(file_p, None)
+
+    def _parse_ini(self, file_p, report):
+        '''Parse an ini file, raising errors or adding them to ``report``.
+
+        :type file_p: file
+        :type report: None or ValidationReport
+        '''
+        from six.moves import configparser
+
+        self._check_not_frozen()
         config = configparser.ConfigParser()
         # Need to set optionxform to `str` so that ConfigParser will be case
         # sensitive in its parsing of section headers and keys
         config.optionxform = str
-        config.readfp(file_p)
+        try:
+            # readfp was renamed read_file in Python 3.2 and removed in 3.12.
+            getattr(config, 'read_file', getattr(config, 'readfp', None))(file_p)
+        except configparser.Error as exc:
+            self._report(report, 'malformed', 'ini', getattr(file_p, 'name', '<ini>'), exc)
+            return
         for section in config.sections():
             for name, value in config.items(section):
-                self.get(section, name).set(value)
+                qualified = '%s.%s' % (section, name)
+                try:
+                    flag = self.get(section, name)
+                except KeyError:
+                    if report is None:
+                        raise
+                    report.add('unknown', 'ini', qualified, 'unknown flag: %s' % qualified)
+                    continue
+                self._set_reported(report, 'ini', qualified, flag, value)
+
+    def validate(self, args=None, environ=None, ini=None):
+        '''Parse all given sources, collecting every error in a single pass.
+
+        Unlike the individual parsers, this does not stop at the first
+        unknown, ambiguous or malformed flag. Sources are applied in the
+        order environment, ini file, command line, and required flags
+        still unset afterwards are reported as missing. Valid values
+        are set as by the parsers::
+
+          report = flag.GLOBAL_FLAGS.validate(
+              sys.argv[1:], os.environ.items(), open('config.ini'))
+          if not report.ok:
+              sys.exit(report.format_text())
+
+        :type args: None or list[str]
+        :type environ: None or list[tuple(str, str)]
+        :type ini: None or file
+        :rtype: ValidationReport
+        '''
+        report = ValidationReport()
+        if environ is not None:
+            self._parse_environment(environ, report)
+        if ini is not None:
+            self._parse_ini(ini, report)
+        if args is not None:
+            self._parse_commandline(args, report)
+        for namespace, name, _ in self.check_required():
+            report.add('missing', 'required', '%s.%s' % (namespace, name),
+                       'missing required flag')
+        return report
+
+
+ValidationIssue = collections.namedtuple('ValidationIssue', 'kind source name message')
+
+
+class ValidationReport(object):
+
+    '''Errors collected by :meth:`GlobalFlagSet.validate`.
+
+    Each error is a :class:`ValidationIssue` with a ``kind`` of
+    ``'unknown'``, ``'ambiguous'``, ``'malformed'`` or ``'missing'``,
+    the ``source`` it came from (``'commandline'``, ``'environment'``,
+    ``'ini'`` or ``'required'``), the flag ``name`` and a ``message``.
+    '''
+
+    def __init__(self):
+        self.errors = []
+
+    @property
+    def ok(self):
+        '''
+        :rtype: bool
+        '''
+        return not self.errors
+
+    def add(self, kind, source, name, message):
+        '''
+        :type kind: str
+        :type source: str
+        :type name: str
+        :type message: str
+        '''
+        self.errors.append(ValidationIssue(kind, source, name, message))
+
+    def format_text(self):
+        '''Returns the errors as text, one per line.
+
+        :rtype: str
+        '''
+        return ''.join('%s flag %s (%s): %s\n' % error for error in self.errors)
+
+    def to_json(self):
+        '''Returns the report as a JSON document.
+
+        :rtype: str
+        '''
+        import json
+
+        return json.dumps({
+            'ok': self.ok,
+            'errors': [dict(error._asdict()) for error in self.errors],
+        }, sort_keys=True)
 
 
 class NamespaceFlagSet(object):
 
     '''Represents a set of flags in a namespace.'''
 
-    def __init__(self):
-        '''Create a new :class:`NamespaceFlagSet`.'''
+    # Internal state other than ``_flags`` lives in slots so it is not
+    # mistaken for a flag by __setattr__ or listed by __dir__.
+    __slots__ = ('__dict__', '_pending', '_namespace', '_globalflags', '_frozen', '_lock')
+
+    def __init__(self, namespace=None, globalflags=None):
+        '''Create a new :class:`NamespaceFlagSet`.
+
+        :type namespace: None or str
+        :type globalflags: None or GlobalFlagSet
+        :param globalflags: flag set indexing flags declared in this namespace
+        '''
         self.__dict__['_flags'] = dict()
+        object.__setattr__(self, '_pending', dict())
+        object.__setattr__(self, '_namespace', namespace)
+        object.__setattr__(self, '_globalflags', globalflags)
+        object.__setattr__(self, '_frozen', None)
+        # Guards declaring flags and deferring values for undeclared
+        # flags; reads don't take it.
+        object.__setattr__(self, '_lock', threading.Lock())
 
     def __getattr__(self, name):
         '''Return the value for a flag.
 
+        Values overridden with :func:`override` in the current context
+        take precedence over the flag's value.
+
         :type name: str
         :rtype: Var
         '''
-        return self._flags[name].get()
+        overrides = _OVERRIDES.get()
+        if overrides is None:
+            frozen = self._frozen
+            if frozen is not None and name in frozen:
+                return frozen[name]
+            return self._flags[name].get()
+        flag = self._flags[name]
+        key = flag.origin or flag
+        if key in overrides:
+            return overrides[key]
+        return flag.get()
 
     def __setattr__(self, name, value):
         '''Set a flag accessor if none exists else return a flag value.
@@ -292,27 +1135,81 @@ class NamespaceFlagSet(object):
         :type name: str
         :type value: str or Var
 
-        :raises FlagException: on flag redefinition or invalid definition
+        :raises FlagException: on flag redefinition or invalid definition,
+            or if frozen
         '''
         if name in self.__dict__:
             self.__dict__[name] = value
             return
+        if self._frozen is not None:
+            raise FlagException('cannot set %s: flags are frozen' % name)
         if name in self._flags:
             if isinstance(value, Var):
                 raise FlagException('%s was already defined' % name)
+            flag_obj = self._flags[name]
+            if self._globalflags is not None:
+                flag_obj = self._globalflags._writable(flag_obj)
             if value is UNSET:
-                flag_obj = self._flags[name]
                 try:
                     del flag_obj.value
                 except AttributeError:
                     # No-op unsetting an unset flag.
                     pass
             else:
-                self._flags[name].set(value)
+                flag_obj.set(value)
+            if self._globalflags is not None:
+                self._globalflags._changed(flag_obj)
         else:
             if not isinstance(value, Var):
                 raise FlagException('%s is not a flag.Var' % name)
-            self._flags[name] = value
+            with self._lock:
+                if name in self._flags:
+                    # Declared by another thread since the check above.
+                    raise FlagException('%s was already defined' % name)
+                if self._globalflags is not None:
+                    self._globalflags._declared(self._namespace, name, value)
+                self._flags[name] = value
+                pending = self._pending.pop(name, None)
+            if pending is not None:
+                self._restore(name, *pending)
+
+    def _frozen_view(self):
+        '''Returns an immutable mapping of the flag values, for :meth:`GlobalFlagSet.freeze`.
+
+        :rtype: types.MappingProxyType
+        '''
+        values = dict()
+        for name, flag in list(self._flags.items()):
+            if flag.value.__class__ is SecureValue:
+                continue
+            if isinstance(flag, Derived):
+                try:
+                    values[name] = flag.get()
+                except Exception:  # pylint: disable=broad-except
+                    # Reading the flag raises the error again.
+                    continue
+            else:
+                values[name] = flag.get()
+        return MappingProxyType(values)
+
+    def _restore(self, name, secure, data):
+        '''Restore a serialized value, deferring it if ``name`` is undeclared.
+
+        :type name: str
+        :type secure: bool
+        :type data: object
+        '''
+        with self._lock:
+            flag = self._flags.get(name)
+            if flag is None:
+                self._pending[name] = (secure, data)
+                return
+        if self._globalflags is not None:
+            flag = self._globalflags._writable(flag)
+        flag.deserialize(data)
+        flag.secure = flag.secure or secure
+        if self._globalflags is not None:
+            self._globalflags._changed(flag)
 
     def __dir__(self):
         '''Returns all flag attributes declared in the namespace.
@@ -322,6 +1219,61 @@ class NamespaceFlagSet(object):
         return list(self.__dict__.keys()) + list(self._flags.keys())
 
 
+class _Completed(object):
+
+    '''Awaitable that immediately completes with ``result``.'''
+
+    def __init__(self, result):
+        self.result = result
+
+    def __await__(self):
+        return self
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        raise StopIteration(self.result)
+
+    next = __next__
+
+
+class _Override(object):
+
+    '''Context manager returned by :func:`override`.'''
+
+    def __init__(self, namespace, values):
+        '''
+        :type namespace: NamespaceFlagSet
+        :type values: dict[str, object]
+        :raises KeyError: if a flag is not declared in ``namespace``
+        '''
+        self.overrides = {}
+        for name, value in values.items():
+            flag = namespace._flags[name]
+            self.overrides[flag.origin or flag] = flag.default if value is UNSET else value
+        self.tokens = []
+
+    def __enter__(self):
+        current = _OVERRIDES.get()
+        merged = dict(current) if current else {}
+        merged.update(self.overrides)
+        self.tokens.append(_OVERRIDES.set(merged))
+        return self
+
+    def __exit__(self, *exc_info):
+        _OVERRIDES.reset(self.tokens.pop())
+
+    def __aenter__(self):
+        if contextvars is None:
+            # Thread-local overrides would leak into other tasks on the loop.
+            raise FlagException('async overrides require contextvars (Python 3.7)')
+        return _Completed(self.__enter__())
+
+    def __aexit__(self, *exc_info):
+        return _Completed(self.__exit__(*exc_info))
+
+
 class FlagException(Exception):
 
     '''Error in flag initialization or access.'''
@@ -332,12 +1284,179 @@ class ParseException(Exception):
     '''Error in command-line parsing.'''
 
 
+class SecureValue(object):
+
+    '''A secret flag value that stays base64 encoded until it is read.
+
+    Decoded bytes are kept in a buffer that :meth:`zero` overwrites, and
+    the value is coerced from them on every read. At most
+    :attr:`cache_size` values stay decoded process-wide, and the least
+    recently read are zeroed first; with a :attr:`cache_size` of ``0``
+    values are decoded on every read. Coerced values returned to callers
+    are ordinary objects and cannot be zeroed.
+    '''
+
+    __slots__ = ('encoded', '_buffer')
+
+    cache_size = 16
+    _cache = collections.OrderedDict()
+    _lock = threading.Lock()
+
+    def __init__(self, encoded):
+        '''
+        :type encoded: str or bytes
+        '''
+        self.encoded = encoded
+        self._buffer = None
+
+    def get(self, flag):
+        '''Return the decoded value, coerced by ``flag``'s setter.
+
+        :type flag: Var
+        '''
+        import base64
+
+        with self._lock:
+            buffer = self._buffer
+            if buffer is not None:
+                del self._cache[self]
+                self._cache[self] = True
+                data = bytes(buffer)
+        if buffer is not None:
+            return flag.coerce_value(flag._decode_secure(data))
+        buffer = bytearray(base64.b64decode(self.encoded))
+        value = flag.coerce_value(flag._decode_secure(bytes(buffer)))
+        if self.cache_size <= 0:
+            buffer[:] = bytearray(len(buffer))
+            return value
+        with self._lock:
+            if self._buffer is None:
+                self._buffer = buffer
+                self._cache[self] = True
+            else:
+                buffer[:] = bytearray(len(buffer))
+            while len(self._cache) > self.cache_size:
+                oldest, _ = self._cache.popitem(last=False)
+                oldest._wipe()
+        return value
+
+    def zero(self):
+        '''Overwrite and drop the decoded bytes, if any.'''
+        with self._lock:
+            self._cache.pop(self, None)
+            self._wipe()
+
+    @classmethod
+    def zero_all(cls):
+        '''Overwrite and drop the decoded bytes of all values.'''
+        with cls._lock:
+            while cls._cache:
+                value, _ = cls._cache.popitem()
+                value._wipe()
+
+    def _wipe(self):
+        if self._buffer is not None:
+            self._buffer[:] = bytearray(len(self._buffer))
+        self._buffer = None
+
+    def __reduce__(self):
+        return (SecureValue, (self.encoded,))
+
+    def __repr__(self):
+        return '<secure>'
+
+    __str__ = __repr__
+
+
+class DescriptionTable(object):
+
+    '''Flag descriptions kept in a file rather than in memory.
+
+    Each lookup reads the file, except within a ``with`` block, during
+    which the descriptions are loaded once. See
+    :meth:`GlobalFlagSet.offload_descriptions`.
+    '''
+
+    def __init__(self, path, descriptions):
+        '''Write ``descriptions`` to ``path``.
+
+        :type path: str
+        :type descriptions: dict[str, str]
+        '''
+        self.path = path
+        self._entries = None
+        self._depth = 0
+        self._lock = threading.Lock()
+        import json
+
+        with open(path, 'w') as out:
+            json.dump(descriptions, out)
+
+    def _load(self):
+        import json
+
+        with open(self.path) as file_p:
+            return json.load(file_p)
+
+    def get(self, key):
+        '''
+        :type key: str
+        :rtype: str
+        '''
+        entries = self._entries
+        if entries is None:
+            entries = self._load()
+        return entries[key]
+
+    def __enter__(self):
+        with self._lock:
+            self._depth += 1
+            if self._entries is None:
+                try:
+                    self._entries = self._load()
+                except Exception:
+                    self._depth -= 1
+                    raise
+        return self
+
+    def __exit__(self, *_):
+        with self._lock:
+            self._depth -= 1
+            if not self._depth:
+                self._entries = None
+
+
+class _NoTable(object):
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        pass
+
+
+_NO_TABLE = _NoTable()
+
+
 class Var(object):
 
     '''Base of all flag accessors.'''
 
     value = UNSET
     type_str = 'Unknown'
+    #: Whether ``SECURED_SETTING_`` values are held encoded in a
+    #: :class:`SecureValue` until read. Flags storing their value
+    #: somewhere other than ``value`` set this to ``False`` and are set
+    #: from the decoded value when parsed.
+    secure_lazily = True
+    #: Whether setting the flag changes state outside the flag object,
+    #: so a :meth:`GlobalFlagSet.clone` can't copy it on write.
+    shared_state = False
+    #: The flag this was copied from when first written in a clone.
+    origin = None
+    #: Set with :meth:`GlobalFlagSet.offload_descriptions`, after which
+    #: ``_description`` is the key of the description in the table.
+    _descriptions = None
 
     def __init__(self, description, default=None, secure=False):
         '''Create a new Var flag accessor.
@@ -352,7 +1471,12 @@ class Var(object):
 
     def get(self):
         '''Return the flag value, or default if it is not set.'''
-        return self.value if self.is_set() else self.default
+        value = self.value
+        if value is UNSET:
+            return self.default
+        if value.__class__ is SecureValue:
+            return value.get(self)
+        return value
 
     def is_set(self):
         '''
@@ -360,6 +1484,72 @@ class Var(object):
         '''
         return self.value is not UNSET
 
+    @property
+    def description(self):
+        '''The description, read from a :class:`DescriptionTable` if offloaded.
+
+        :rtype: str
+        '''
+        if self._descriptions is None:
+            return self._description
+        return self._descriptions.get(self._description)
+
+    @description.setter
+    def description(self, description):
+        self._description = description
+        self.__dict__.pop('_descriptions', None)
+
+    def _offload_description(self, table, key):
+        self._description, self._descriptions = key, table
+        # Wrapped flags (List, Choices, ...) hold the description too.
+        inner = self.__dict__.get('inner_value')
+        if isinstance(inner, Var):
+            inner._offload_description(table, key)
+
+    def coerce_value(self, value):
+        '''Return what :meth:`set` would store for ``value`` without setting it.
+
+        Subclasses whose :meth:`set` has effects beyond storing the value
+        should override this.
+
+        :type value: str
+        '''
+        scratch = self._scratch()
+        scratch.set(value)
+        return scratch.value
+
+    def _scratch(self):
+        '''Return a copy to call :meth:`set` on, sharing no mutable flag with this one.'''
+        scratch = copy.copy(self)
+        inner = self.__dict__.get('inner_value')
+        if isinstance(inner, Var):
+            scratch.inner_value = inner._scratch()
+        return scratch
+
+    def _decode_secure(self, data):
+        '''Return the decoded bytes of a secure value as :meth:`set` takes them.
+
+        :type data: bytes
+        :rtype: str
+        '''
+        return data.decode('utf-8')
+
+    def serialize(self):
+        '''Return the set value in a form that can be pickled.
+
+        Subclasses holding values that cannot be pickled should
+        override this and :meth:`deserialize`.
+        '''
+        return self.value
+
+    def deserialize(self, data):
+        '''Set the value from the result of :meth:`serialize`.'''
+        self.value = data
+
+    def __repr__(self):
+        value = '<secure>' if self.secure else repr(self.value)
+        return '<%s %s>' % (self.type_str, value)
+
 
 class String(Var):
 
@@ -374,6 +1564,10 @@ class String(Var):
     def set(self, value):
         self.value = value
 
+    def _decode_secure(self, data):
+        # Secure strings have always been read as bytes.
+        return data
+
 
 class Int(Var):
 
@@ -460,6 +1654,78 @@ class List(Var):
             self.value.append(self.inner_value.get())
 
 
+class Derived(Var):
+
+    '''Flag computed from the values of other flags.
+
+    ``source`` is either a function called with the values of the
+    ``depends`` flags, or a string in which ``${namespace.flag}``
+    references are replaced by the referenced flags' values::
+
+        FLAGS.url = flag.Derived('database url',
+                                 'postgres://${db.host}:${db.port}/app')
+        FLAGS.pool_size = flag.Derived('connection pool size', operator.mul,
+                                       depends=['server.workers', 'server.threads'])
+
+    Names without a namespace refer to flags in the namespace the
+    derived flag is declared in. Dependencies may be declared later,
+    but not in a cycle. The value is computed on first read and
+    memoized until a flag it depends on, directly or through another
+    derived flag, is set or unset through the flag set. Derived flags
+    can't be set, and ignore :func:`override`. A derived flag is
+    ``secure`` if any flag it depends on is.
+    '''
+
+    type_str = 'Derived'
+
+    def __init__(self, description, source, depends=None, secure=False):
+        '''
+        :type description: str
+        :type source: str or F(...)
+        :type depends: None or list[str]
+        :param depends: names of the flags passed to ``source`` if it is a function
+        :type secure: bool
+        '''
+        super(Derived, self).__init__(description, None, secure)
+        self.source = source
+        if callable(source):
+            self.depends = list(depends or ())
+        else:
+            self.depends = _INTERPOLATION_RE.findall(source)
+        self.globalflags = None
+        self.memo = UNSET
+
+    def get(self):
+        '''Return the derived value, computing it if a dependency changed.
+
+        :raises FlagException: if not declared in a flag set, or a
+            dependency is not declared yet
+        '''
+        memo = self.memo
+        if memo is UNSET:
+            memo = self.memo = self._compute()
+        return memo
+
+    def _compute(self):
+        if self.globalflags is None:
+            raise FlagException('derived flag is not declared in a flag set')
+        values = dict()
+        for name in self.depends:
+            try:
+                flag = self.globalflags._lookup(name)
+            except KeyError:
+                raise FlagException('undeclared dependency %s' % name)
+            values[name] = flag.get()
+        if callable(self.source):
+            return self.source(*[values[name] for name in self.depends])
+        # References are replaced in the order they were found.
+        names = iter(self.depends)
+        return _INTERPOLATION_RE.sub(lambda _: str(values[next(names)]), self.source)
+
+    def set(self, value):
+        raise FlagException('derived flags cannot be set')
+
+
 # Default functions that use the default flagset.
 GLOBAL_FLAGS = GlobalFlagSet()
 
@@ -473,6 +1739,66 @@ def namespace(name):
     return GLOBAL_FLAGS.namespace(name)
 
 
+@contextlib.contextmanager
+def isolate():
+    '''Run the block with a :meth:`~GlobalFlagSet.clone` of :const:`GLOBAL_FLAGS`.
+
+    Flags set, unset or declared in the block, including through
+    :class:`NamespaceFlagSet` objects obtained before it (e.g. by
+    modules at import time), only affect the clone, which is discarded
+    when the block exits::
+
+      with flag.isolate():
+          flag.parse_commandline(['--some_int=42'])
+          assert FLAGS.some_int == 42
+
+    This replaces process-wide state, so blocks must not run
+    concurrently with each other or with code using flags from other
+    threads. Flags with :attr:`~Var.shared_state`, such as
+    :class:`~oscar.flag.contrib.GroupBool` and
+    :class:`~oscar.flag.contrib.LogLevel`, can't be set in the block.
+
+    :rtype: GlobalFlagSet
+    :returns: the clone, valid only inside the block
+    '''
+    global GLOBAL_FLAGS
+    saved_flags = GLOBAL_FLAGS
+    clone = saved_flags.clone()
+    saved_namespaces = clone._adopt(saved_flags)
+    GLOBAL_FLAGS = clone
+    try:
+        yield clone
+    finally:
+        GLOBAL_FLAGS = saved_flags
+        GlobalFlagSet._release(saved_namespaces)
+
+
+def override(namespace, **values):
+    '''Override flag values for the current context only.
+
+    Overrides are visible to reads through :class:`NamespaceFlagSet`
+    in the current thread or asyncio task (and contexts copied from
+    it), and are removed when the block exits. Without
+    :mod:`contextvars` (Python < 3.7), overrides are per thread only,
+    and ``async with`` raises :exc:`FlagException`. Values are used as-is
+    rather than parsed, and :const:`UNSET` overrides a flag with its
+    default::
+
+      with flag.override(FLAGS, some_int=42):
+          assert FLAGS.some_int == 42
+
+      async with flag.override('foo.bar', some_bool=True):
+          ...
+
+    :type namespace: NamespaceFlagSet or str
+    :param namespace: namespace, or name of a :const:`GLOBAL_FLAGS` namespace
+    :raises KeyError: if a flag is not declared in ``namespace``
+    '''
+    if isinstance(namespace, six.string_types):
+        namespace = GLOBAL_FLAGS.namespace(namespace)
+    return _Override(namespace, values)
+
+
 def parse_commandline(args):
     '''Parse commandline ``args`` with :const:`GLOBAL_FLAGS`.
 
@@ -497,6 +1823,22 @@ def parse_ini(file_p):
     GLOBAL_FLAGS.parse_ini(file_p)
 
 
+def export_snapshot(file_p):
+    '''Write a snapshot of :const:`GLOBAL_FLAGS` to ``file_p``.
+
+    :type file_p: file
+    '''
+    GLOBAL_FLAGS.export_snapshot(file_p)
+
+
+def import_snapshot(file_p):
+    '''Restore :const:`GLOBAL_FLAGS` from a snapshot in ``file_p``.
+
+    :type file_p: file
+    '''
+    GLOBAL_FLAGS.import_snapshot(file_p)
+
+
 def args():
     '''Return positional ``args`` from :const:`GLOBAL_FLAGS`.
 
@@ -505,6 +1847,17 @@ def args():
     return GLOBAL_FLAGS.args
 
 
+def validate(args=None, environ=None, ini=None):
+    '''Parse and validate all sources with :const:`GLOBAL_FLAGS`.
+
+    :type args: None or list[str]
+    :type environ: None or list[tuple(str, str)]
+    :type ini: None or file
+    :rtype: ValidationReport
+    '''
+    return GLOBAL_FLAGS.validate(args, environ, ini)
+
+
 def die_on_missing_required():
     '''If missing required flags, die and write usage.'''
     nonset = GLOBAL_FLAGS.check_required()
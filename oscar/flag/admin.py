@@ -0,0 +1,200 @@
+'''HTTP endpoint serving the current state of all flags.
+
+The state is a JSON document mapping namespaces to flags::
+
+  {"foo.bar": {"baz": {"default": 0, "set": true, "type": "Int", "value": 42}}}
+
+Values of ``secure`` flags are replaced with ``"<secure>"``, and those
+of flags that fail to compute, such as a
+:class:`~oscar.flag.Derived` flag with an undeclared dependency, with
+``"<error>"`` and the error message under ``"error"``. The
+document is serialized once and reused until a flag is declared, set or
+unset through the flag set (see :attr:`~oscar.flag.GlobalFlagSet.generation`),
+and carries an ``ETag`` so scrapers sending ``If-None-Match`` get an
+empty ``304 Not Modified``. Values set by calling
+:meth:`~oscar.flag.Var.set` directly are only picked up with the next
+change made through the flag set.
+'''
+import hashlib
+import json
+import os
+import threading
+
+from six.moves import BaseHTTPServer
+from six.moves import socketserver
+
+from oscar import flag
+
+PATH = '/flags'
+REDACTED = '<secure>'
+ERROR = '<error>'
+
+
+def flag_state(globalflags):
+    '''Returns the state of all flags in ``globalflags``, with secure values redacted.
+
+    :type globalflags: oscar.flag.GlobalFlagSet
+    :rtype: dict[str, dict[str, dict]]
+    '''
+    state = {}
+    for namespace, name, var in globalflags.iter_flags():
+        entry = state.setdefault(namespace, {})[name] = {
+            'type': var.type_str,
+            'set': var.is_set(),
+        }
+        if var.secure:
+            entry['value'] = entry['default'] = REDACTED
+            continue
+        entry['default'] = var.default
+        try:
+            entry['value'] = var.get()
+        except Exception as exc:  # pylint: disable=broad-except
+            # One broken flag mustn't fail every scrape.
+            entry['value'], entry['error'] = ERROR, str(exc)
+    return state
+
+
+class StateCache(object):
+
+    '''Serialized :func:`flag_state`, refreshed only when flags changed.'''
+
+    def __init__(self, globalflags):
+        '''
+        :type globalflags: oscar.flag.GlobalFlagSet
+        '''
+        self.globalflags = globalflags
+        self._lock = threading.Lock()
+        self._generation = None
+        self._body = None
+        self._etag = None
+
+    def get(self):
+        '''Returns the serialized state and its ETag.
+
+        :rtype: tuple(bytes, str)
+        '''
+        with self._lock:
+            generation = self.globalflags.generation
+            if generation != self._generation:
+                body = json.dumps(flag_state(self.globalflags), sort_keys=True,
+                                  default=str).encode('utf-8')
+                self._body = body
+                self._etag = '"%s"' % hashlib.sha1(body).hexdigest()
+                self._generation = generation
+            return self._body, self._etag
+
+
+def _etag_matches(header, etag):
+    if header is None:
+        return False
+    tags = [tag.strip() for tag in header.split(',')]
+    return '*' in tags or etag in tags or ('W/' + etag) in tags
+
+
+def make_handler(globalflags=None):
+    '''Returns a request handler class serving the state of ``globalflags``.
+
+    The handler answers ``GET`` and ``HEAD`` requests for :const:`PATH`
+    and can be used with any :mod:`BaseHTTPServer`/:mod:`http.server`
+    compatible server.
+
+    :type globalflags: None or oscar.flag.GlobalFlagSet
+    :param globalflags: defaults to :const:`oscar.flag.GLOBAL_FLAGS`
+    :rtype: type
+    '''
+    if globalflags is None:
+        globalflags = flag.GLOBAL_FLAGS
+    cache = StateCache(globalflags)
+
+    class FlagStateHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+
+        '''Serves :func:`flag_state` as JSON.'''
+
+        state_cache = cache
+
+        def do_GET(self):
+            self._respond(send_body=True)
+
+        def do_HEAD(self):
+            self._respond(send_body=False)
+
+        def _respond(self, send_body):
+            if self.path.split('?', 1)[0] != PATH:
+                self.send_error(404)
+                return
+            body, etag = self.state_cache.get()
+            if _etag_matches(self.headers.get('If-None-Match'), etag):
+                self.send_response(304)
+                self.send_header('ETag', etag)
+                self.end_headers()
+                return
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.send_header('ETag', etag)
+            self.end_headers()
+            if send_body:
+                self.wfile.write(body)
+
+        def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+            # Frequent scrapes would flood stderr.
+            pass
+
+    return FlagStateHandler
+
+
+class _ThreadingHTTPServer(socketserver.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+
+    daemon_threads = True
+
+
+class _ThreadingUnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+
+    daemon_threads = True
+
+    def get_request(self):
+        request, _ = socketserver.UnixStreamServer.get_request(self)
+        # BaseHTTPRequestHandler expects a (host, port) client address.
+        return request, ('', 0)
+
+
+def make_server(address, globalflags=None):
+    '''Returns a threaded HTTP server for the state of ``globalflags``.
+
+    Call ``serve_forever()`` on the result, e.g. in a daemon thread
+    (see :func:`serve_in_background`).
+
+    :type address: tuple(str, int) or str
+    :param address: ``(host, port)`` to listen on, or the path of a unix
+        socket; an existing file at that path is replaced
+    :type globalflags: None or oscar.flag.GlobalFlagSet
+    :param globalflags: defaults to :const:`oscar.flag.GLOBAL_FLAGS`
+    :rtype: socketserver.BaseServer
+    '''
+    handler = make_handler(globalflags)
+    if isinstance(address, tuple):
+        return _ThreadingHTTPServer(address, handler)
+    if os.path.exists(address):
+        os.unlink(address)
+    return _ThreadingUnixHTTPServer(address, handler)
+
+
+def serve_in_background(address, globalflags=None):
+    '''Start serving flag state from a daemon thread.
+
+    ::
+
+      from oscar.flag import admin as flag_admin
+
+      flag_admin.serve_in_background(('127.0.0.1', 9901))
+
+    :type address: tuple(str, int) or str
+    :type globalflags: None or oscar.flag.GlobalFlagSet
+    :rtype: socketserver.BaseServer
+    :returns: the running server; call ``shutdown()`` to stop it
+    '''
+    server = make_server(address, globalflags)
+    thread = threading.Thread(target=server.serve_forever, name='oscar.flag.admin')
+    thread.daemon = True
+    thread.start()
+    return server
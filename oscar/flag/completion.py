@@ -0,0 +1,216 @@
+'''Shell completion for flags, answered from an index cached on disk.
+
+The application writes the index (e.g. at build or install time, or
+whenever its flags change) with :func:`write_index`, and the shell
+scripts from :func:`script` query it through ``python -m
+oscar.flag.completion``, which only reads the index and never imports
+the application.
+'''
+import bisect
+import hashlib
+import json
+import os
+import shlex
+import sys
+
+_BOOL_VALUES = ['false', 'true']
+
+_BASH_SCRIPT = '''_%(func)s_flag_complete() {
+    local IFS=$'\\n'
+    COMPREPLY=($(%(command)s --shell=bash "${COMP_LINE:0:COMP_POINT}"))
+}
+complete -o default -F _%(func)s_flag_complete %(prog)s
+'''
+
+_ZSH_SCRIPT = '''_%(func)s_flag_complete() {
+    local -a candidates
+    candidates=(${(f)"$(%(command)s "${BUFFER[1,CURSOR]}")"})
+    compadd -Q -- $candidates
+}
+compdef _%(func)s_flag_complete %(prog)s
+'''
+
+_FISH_SCRIPT = '''complete -c %(prog)s -f -a '(%(command)s (commandline -cp))'
+'''
+
+_SCRIPTS = {'bash': _BASH_SCRIPT, 'zsh': _ZSH_SCRIPT, 'fish': _FISH_SCRIPT}
+
+
+def build_index(globalflags):
+    '''Build a completion index for all flags in ``globalflags``.
+
+    Flags are indexed by their qualified name and, if unambiguous, their
+    short name. Values are indexed for :class:`~oscar.flag.Bool` flags
+    and flags with ``choices``; those of :class:`~oscar.flag.Bool` flags
+    are only completed after ``=``, as the parser doesn't read the next
+    word as their value.
+
+    :type globalflags: oscar.flag.GlobalFlagSet
+    :rtype: dict
+    '''
+    flags = ['--help', '--helplong']
+    values = {}
+    inline = []
+
+    def _add(namespace, name, var):
+        names = ['--%s.%s' % (namespace, name)]
+        try:
+            globalflags.find_short(name)
+        except KeyError:
+            pass
+        else:
+            names.append('--' + name)
+        if var.type_str == 'Bool':
+            choices = _BOOL_VALUES
+        elif getattr(var, 'choices', None) is not None:
+            choices = sorted(str(choice) for choice in var.choices)
+        else:
+            choices = None
+        for flag_name in names:
+            flags.append(flag_name)
+            if choices is not None:
+                values[flag_name] = choices
+            if var.type_str == 'Bool':
+                inline.append(flag_name)
+    globalflags.visit_all(_add)
+    return {
+        'flags': sorted(flags),
+        'values': values,
+        'inline': sorted(inline),
+    }
+
+
+def _digest(index):
+    data = json.dumps(index, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha1(data.encode('utf-8')).hexdigest()
+
+
+def write_index(path, globalflags=None):
+    '''Write the completion index for ``globalflags`` to ``path``.
+
+    The index is only rewritten if its content changed since it was
+    last written.
+
+    :type path: str
+    :type globalflags: None or oscar.flag.GlobalFlagSet
+    :param globalflags: defaults to :const:`oscar.flag.GLOBAL_FLAGS`
+    '''
+    if globalflags is None:
+        from oscar import flag
+        globalflags = flag.GLOBAL_FLAGS
+    index = build_index(globalflags)
+    index['digest'] = _digest(index)
+    try:
+        if load_index(path)['digest'] == index['digest']:
+            return
+    except (IOError, OSError, ValueError, KeyError):
+        pass
+    tmp_path = '%s.%d.tmp' % (path, os.getpid())
+    with open(tmp_path, 'w') as index_file:
+        json.dump(index, index_file, separators=(',', ':'))
+    os.rename(tmp_path, path)
+
+
+def load_index(path):
+    '''Load an index written by :func:`write_index`.
+
+    :type path: str
+    :rtype: dict
+    '''
+    with open(path) as index_file:
+        return json.load(index_file)
+
+
+def _prefixed(candidates, prefix):
+    start = bisect.bisect_left(candidates, prefix)
+    end = start
+    while end < len(candidates) and candidates[end].startswith(prefix):
+        end += 1
+    return candidates[start:end]
+
+
+def complete(index, line, shell=None):
+    '''Returns completions for the last word of the command ``line``.
+
+    ``line`` is the command line up to the cursor. Flags may be
+    completed with a single or double dash, and values after ``=`` or,
+    except for :class:`~oscar.flag.Bool` flags, as the word following a
+    flag.
+
+    :type index: dict
+    :type line: str
+    :type shell: None or str
+    :param shell: for ``'bash'``, which splits words on ``=``, values
+        completed after ``=`` are returned without the flag name
+    :rtype: list[str]
+    '''
+    words = line.split()
+    if not line or line[-1].isspace():
+        words.append('')
+    if len(words) < 2:
+        return []
+    word, previous = words[-1], words[-2]
+    if previous.startswith('-') and not previous.startswith('--'):
+        previous = '-' + previous
+    if not word.startswith('-'):
+        if '=' in previous or previous in index.get('inline', ()):
+            return []
+        return _prefixed(index['values'].get(previous, []), word)
+    # Index entries use double dashes; answer single dash words in kind.
+    strip = 0
+    if not word.startswith('--'):
+        strip, word = 1, '-' + word
+    if '=' in word:
+        name, value = word.split('=', 1)
+        candidates = _prefixed(index['values'].get(name, []), value)
+        if shell == 'bash':
+            return candidates
+        return ['%s=%s' % (name[strip:], candidate) for candidate in candidates]
+    return [candidate[strip:] for candidate in _prefixed(index['flags'], word)]
+
+
+def script(shell, prog, index_path):
+    '''Returns a completion script for ``prog`` in ``shell``.
+
+    :type shell: str
+    :param shell: one of ``'bash'``, ``'zsh'`` or ``'fish'``
+    :type prog: str
+    :type index_path: str
+    :rtype: str
+    :raises ValueError: on an unsupported shell
+    '''
+    if shell not in _SCRIPTS:
+        raise ValueError('unsupported shell: %s' % shell)
+    command = ' '.join(_quote(arg) for arg in (
+        sys.executable, '-m', 'oscar.flag.completion', os.path.abspath(index_path)))
+    func = ''.join(c if c.isalnum() else '_' for c in os.path.basename(prog))
+    return _SCRIPTS[shell] % {'func': func, 'prog': prog, 'command': command}
+
+
+def _quote(arg):
+    quote = getattr(shlex, 'quote', None)
+    if quote is None:  # Python 2
+        from pipes import quote
+    return quote(arg)
+
+
+def main(argv):
+    '''Print completions, one per line: ``[--shell=SHELL] INDEX LINE``.'''
+    shell = None
+    if argv and argv[0].startswith('--shell='):
+        shell = argv[0][len('--shell='):]
+        argv = argv[1:]
+    if len(argv) != 2:
+        sys.stderr.write('usage: %s [--shell=SHELL] INDEX LINE\n' % sys.argv[0])
+        return 2
+    try:
+        index = load_index(argv[0])
+    except (IOError, OSError, ValueError):
+        return 1
+    for candidate in complete(index, argv[1], shell):
+        sys.stdout.write(candidate + '\n')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -1,11 +1,16 @@
-import json
-import logging
+import collections
+import contextlib
+import re
+import struct
+import threading
 
 import six
-from dateutil import parser
 
 from oscar import flag
 
+# hashlib, json, logging and dateutil are imported on first use, so that importing
+# this module doesn't pay for flag types that are never declared or set.
+
 
 class Datetime(flag.Var):
 
@@ -14,6 +19,8 @@ class Datetime(flag.Var):
     type_str = 'Datetime'
 
     def set(self, value):
+        from dateutil import parser
+
         # pylint: disable=attribute-defined-outside-init
         self.value = parser.parse(value)
         if self.value.tzinfo is None:
@@ -27,10 +34,299 @@ class Date(flag.Var):
     type_str = 'Date'
 
     def set(self, value):
+        from dateutil import parser
+
         # pylint: disable=attribute-defined-outside-init
         self.value = parser.parse(value).date()
 
 
+_DURATION_RE = re.compile(r'^(?:\d+(?:\.\d+)?(?:ns|us|ms|s|m|h|d))+$')
+_DURATION_PART_RE = re.compile(r'(\d+(?:\.\d+)?)(ns|us|ms|s|m|h|d)')
+_DURATION_UNITS = {
+    'ns': 1e-9, 'us': 1e-6, 'ms': 1e-3, 's': 1, 'm': 60, 'h': 3600, 'd': 86400}
+_BYTE_SIZE_RE = re.compile(r'^(\d+(?:\.\d+)?)\s*(?:([kmgtpe])(i)?)?b?$', re.IGNORECASE)
+_BYTE_SIZE_POWERS = {'k': 1, 'm': 2, 'g': 3, 't': 4, 'p': 5, 'e': 6}
+
+
+def _range_check(minimum, maximum):
+    '''Returns a function validating that a value is within the bounds.
+
+    Bounds are resolved here, once, so the returned check only compares.
+    '''
+    def _fail(value):
+        raise ValueError('%s not in range [%s, %s]' % (
+            value, '' if minimum is None else minimum, '' if maximum is None else maximum))
+
+    if minimum is None and maximum is None:
+        return lambda value: value
+
+    if maximum is None:
+        def _check(value):
+            if value < minimum:
+                _fail(value)
+            return value
+    elif minimum is None:
+        def _check(value):
+            if value > maximum:
+                _fail(value)
+            return value
+    else:
+        def _check(value):
+            if not minimum <= value <= maximum:
+                _fail(value)
+            return value
+    return _check
+
+
+class _Bounded(flag.Var):
+
+    '''Base for numeric flags with optional inclusive bounds.
+
+    Subclasses implement ``parse`` to convert a string to the canonical
+    numeric value. Defaults are parsed and checked at declaration.
+    '''
+
+    def __init__(self, description, default=None, secure=False, minimum=None, maximum=None):
+        super(_Bounded, self).__init__(description, default, secure)
+        self.minimum = minimum
+        self.maximum = maximum
+        self._check = _range_check(minimum, maximum)
+        if default is not None and default is not flag.REQUIRED:
+            self.default = self._check(self.parse(default))
+
+    def set(self, value):
+        # pylint: disable=attribute-defined-outside-init
+        self.value = self._check(self.parse(value))
+
+
+class BoundedInt(_Bounded):
+
+    '''Integer-valued flag within inclusive ``minimum`` and ``maximum`` bounds.'''
+
+    type_str = 'Int'
+
+    def parse(self, value):
+        return int(value)
+
+
+class BoundedFloat(_Bounded):
+
+    '''Float-valued flag within inclusive ``minimum`` and ``maximum`` bounds.'''
+
+    type_str = 'Float'
+
+    def parse(self, value):
+        return float(value)
+
+
+class Duration(_Bounded):
+
+    '''Duration flag stored as float seconds.
+
+    Accepts plain seconds (``'1.5'``) or unit-suffixed values, which may
+    be combined (``'250ms'``, ``'1h30m'``). Units are ``ns``, ``us``,
+    ``ms``, ``s``, ``m``, ``h`` and ``d``. Bounds are in seconds.
+    Durations must be finite and not negative.
+    '''
+
+    type_str = 'Duration'
+
+    def parse(self, value):
+        if not isinstance(value, six.string_types):
+            seconds = float(value)
+        elif _DURATION_RE.match(value.strip()):
+            seconds = float(sum(float(amount) * _DURATION_UNITS[unit]
+                                for amount, unit in _DURATION_PART_RE.findall(value)))
+        else:
+            try:
+                seconds = float(value)
+            except ValueError:
+                raise ValueError('invalid duration: %r' % value)
+        # NaN fails every comparison, so it fails this one too.
+        if not 0 <= seconds < float('inf'):
+            raise ValueError('invalid duration: %r' % value)
+        return seconds
+
+
+class ByteSize(_Bounded):
+
+    '''Size flag stored as an integer number of bytes.
+
+    Accepts plain byte counts or sizes with decimal (``'512MB'``,
+    ``'10k'``) or binary (``'2GiB'``, ``'64Ki'``) unit prefixes. The
+    trailing ``B`` is optional and units are case insensitive. Sizes
+    must come out to a whole number of bytes (``'1.5Ki'`` but not
+    ``'1.5'``). Bounds are in bytes.
+    '''
+
+    type_str = 'ByteSize'
+
+    def parse(self, value):
+        if not isinstance(value, six.string_types):
+            if value != int(value):
+                raise ValueError('invalid byte size: %r is not a whole number' % value)
+            return int(value)
+        match = _BYTE_SIZE_RE.match(value.strip())
+        if match is None:
+            raise ValueError('invalid byte size: %r' % value)
+        amount, prefix, binary = match.groups()
+        if '.' not in amount:
+            size = int(amount)
+        else:
+            from fractions import Fraction
+
+            size = Fraction(amount)
+        if prefix is not None:
+            size *= (1024 if binary else 1000) ** _BYTE_SIZE_POWERS[prefix.lower()]
+        if size != int(size):
+            raise ValueError('invalid byte size: %r is not a whole number of bytes' % value)
+        return int(size)
+
+
+_PERCENTAGE_RE = re.compile(r'^(\d+(?:\.\d+)?)\s*%?$')
+# Buckets are the first 8 bytes of the salted digest.
+_ROLLOUT_BUCKETS = 2 ** 64
+
+
+class RolloutState(object):
+
+    '''A rollout percentage with its salt, as held by a :class:`Rollout` flag.
+
+    The bucket threshold and the salted hash state are computed once
+    here, so :meth:`enabled_for` only hashes the key and compares.
+    '''
+
+    def __init__(self, percentage, salt=''):
+        '''
+        :type percentage: float
+        :param percentage: share of keys enabled, from 0 to 100
+        :type salt: str
+        '''
+        import hashlib
+
+        if not 0 <= percentage <= 100:
+            raise ValueError('%s not in range [0, 100]' % percentage)
+        self.percentage = percentage
+        self.salt = salt
+        self._threshold = int(_ROLLOUT_BUCKETS * percentage / 100.0)
+        self._hash = hashlib.sha1(salt.encode('utf-8') + b'\0')
+
+    def bucket(self, key):
+        '''Returns the stable bucket of ``key`` in ``[0, 2**64)``.
+
+        :type key: str or bytes or int
+        :rtype: int
+        '''
+        if not isinstance(key, bytes):
+            key = six.text_type(key).encode('utf-8')
+        digest = self._hash.copy()
+        digest.update(key)
+        return struct.unpack('>Q', digest.digest()[:8])[0]
+
+    def enabled_for(self, key):
+        '''Returns whether ``key`` (e.g. a user id) falls within the rollout.
+
+        :type key: str or bytes or int
+        :rtype: bool
+        '''
+        return self.bucket(key) < self._threshold
+
+    def enabled_for_all(self, keys):
+        '''Evaluate :meth:`enabled_for` for many keys.
+
+        :type keys: iterable[str or bytes or int]
+        :rtype: list[bool]
+        '''
+        if self._threshold == 0:
+            return [False for _ in keys]
+        if self._threshold == _ROLLOUT_BUCKETS:
+            return [True for _ in keys]
+        bucket, threshold = self.bucket, self._threshold
+        return [bucket(key) < threshold for key in keys]
+
+    def __getstate__(self):
+        # Hash objects can't be pickled; they are rebuilt from the salt.
+        return (self.percentage, self.salt)
+
+    def __setstate__(self, state):
+        self.__init__(*state)
+
+    def __eq__(self, other):
+        return (isinstance(other, RolloutState) and
+                (self.percentage, self.salt) == (other.percentage, other.salt))
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return hash((self.percentage, self.salt))
+
+    def __str__(self):
+        return '%g%%' % self.percentage
+
+    def __repr__(self):
+        return '<RolloutState %s salt=%r>' % (self, self.salt)
+
+
+class Rollout(flag.Var):
+
+    '''Percentage rollout flag, enabled for a stable subset of keys.
+
+    The flag is set to a percentage (``'25'`` or ``'25%'``) and holds a
+    :class:`RolloutState`. A key is enabled if its hash, salted with
+    ``salt``, falls in the lowest ``percentage`` of buckets, so each key
+    gets the same answer in every process, raising the percentage only
+    enables more keys, and rollouts with different salts are
+    independent::
+
+        FLAGS.new_path = flag_contrib.Rollout('share of users on the new path',
+                                              '5%', salt='new_path')
+
+        if FLAGS.new_path.enabled_for(user_id):
+            ...
+    '''
+
+    type_str = 'Rollout'
+
+    def __init__(self, description, default=None, salt='', secure=False):
+        super(Rollout, self).__init__(description, default, secure)
+        self.salt = salt
+        if isinstance(default, (six.string_types, six.integer_types, float)):
+            self.default = RolloutState(self.parse(default), salt)
+
+    def parse(self, value):
+        if not isinstance(value, six.string_types):
+            return float(value)
+        match = _PERCENTAGE_RE.match(value.strip())
+        if match is None:
+            raise ValueError('invalid percentage: %r' % value)
+        return float(match.group(1))
+
+    def set(self, value):
+        # pylint: disable=attribute-defined-outside-init
+        self.value = RolloutState(self.parse(value), self.salt)
+
+    def enabled_for(self, key):
+        '''Returns whether ``key`` is enabled, or ``False`` if the flag has no value.
+
+        :type key: str or bytes or int
+        :rtype: bool
+        '''
+        state = self.get()
+        return state is not None and state.enabled_for(key)
+
+    def enabled_for_all(self, keys):
+        '''Returns :meth:`enabled_for` of each of ``keys``.
+
+        :type keys: iterable[str or bytes or int]
+        :rtype: list[bool]
+        '''
+        state = self.get()
+        if state is None:
+            return [False for _ in keys]
+        return state.enabled_for_all(keys)
+
+
 class Choices(flag.Var):
 
     '''Flag with a set of choices.'''
@@ -42,7 +338,11 @@ class Choices(flag.Var):
         self.inner_value = inner_type(description, default, secure)
         self.type_str = inner_type.type_str
         self.choices = choices
-        self.long_description = '\n'.join(str(x) for x in choices)
+
+    @property
+    def long_description(self):
+        # Built on demand; it is only needed for help output.
+        return '\n'.join(str(x) for x in self.choices)
 
     def set(self, value):
         # pylint:disable=attribute-defined-outside-init
@@ -52,6 +352,254 @@ class Choices(flag.Var):
             raise ValueError('%s not a valid value' % value)
 
 
+class IndexedChoices(flag.Var):
+
+    '''Flag with a large set of choices, optionally backed by an :class:`enum.Enum`.
+
+    Membership is checked against a precomputed hash index, and help
+    text is only rendered when requested, listing at most
+    :attr:`help_choices` choices. If ``choices`` is an :class:`enum.Enum`
+    subclass, values are matched against member values and the flag
+    holds the matching member; a default given as a member value is
+    converted to the member::
+
+        FLAGS.region = flag_contrib.IndexedChoices(
+            flag.String, 'region code', Region, default=Region.EAST)
+    '''
+
+    help_choices = 20
+
+    def __init__(self, inner_type, description, choices, default=None, secure=False):
+        super(IndexedChoices, self).__init__(description, default, secure)
+        self.inner_value = inner_type(description, None, secure)
+        self.type_str = inner_type.type_str
+        if hasattr(choices, '__members__'):
+            self.choices = dict((member.value, member) for member in choices)
+        else:
+            self.choices = frozenset(choices)
+        if default is not flag.REQUIRED and not (
+                default in self.choices or default in self._members()):
+            raise flag.FlagException('default value must be a valid choice or REQUIRED')
+        if isinstance(self.choices, dict) and default in self.choices:
+            self.default = self.choices[default]
+
+    def _members(self):
+        if isinstance(self.choices, dict):
+            return self.choices.values()
+        return self.choices
+
+    @property
+    def long_description(self):
+        choices = sorted(str(x) for x in self._members())
+        lines = choices[:self.help_choices]
+        if len(choices) > len(lines):
+            lines.append('... and %d more' % (len(choices) - len(lines)))
+        return '\n'.join(lines)
+
+    def set(self, value):
+        # pylint:disable=attribute-defined-outside-init
+        self.inner_value.set(value)
+        value = self.inner_value.get()
+        if value not in self.choices:
+            raise ValueError('%s not a valid value' % value)
+        self.value = self.choices[value] if isinstance(self.choices, dict) else value
+
+
+class GroupBool(flag.Bool):
+
+    '''Boolean flag stored as one bit of a :class:`BoolGroup`.
+
+    Declared with :meth:`BoolGroup.declare`; it parses and reads like
+    a :class:`~oscar.flag.Bool`. Secure values from the environment are
+    decoded when parsed, since the group only holds bits.
+    '''
+
+    secure_lazily = False
+    shared_state = True
+
+    def __init__(self, group, mask, description, default=None):
+        '''
+        :type group: BoolGroup
+        :type mask: int
+        :param mask: the flag's bit in ``group``
+        :type description: str
+        :type default: None or bool
+        '''
+        super(GroupBool, self).__init__(description, default)
+        self.group = group
+        self.mask = mask
+
+    def _get_value(self):
+        if not self.group.set_bits & self.mask:
+            return flag.UNSET
+        return bool(self.group.bits & self.mask)
+
+    def _set_value(self, value):
+        self.group._assign(self.mask, self.mask if value else 0)
+
+    def _del_value(self):
+        self.group._reset(self.mask)
+
+    value = property(_get_value, _set_value, _del_value)
+
+    def get(self):
+        return bool(self.group.bits & self.mask)
+
+    def coerce_value(self, value):
+        # Parse with a plain Bool; a copy would still share the group.
+        scratch = flag.Bool(self.description)
+        scratch.set(value)
+        return scratch.value
+
+
+class BoolGroup(object):
+
+    '''Boolean flags of a namespace packed into the bits of a single integer.
+
+    Flags are declared through the group and read, set and parsed like
+    :class:`~oscar.flag.Bool` flags, but their values (or defaults)
+    live in :attr:`bits`, so several flags can be checked with one
+    mask test, and :meth:`update` changes several at once::
+
+        FEATURES = flag_contrib.BoolGroup(FLAGS)
+        NEW_UI = FEATURES.declare('new_ui', 'serve the new ui')
+        FAST_PATH = FEATURES.declare('fast_path', 'use the fast path', default=True)
+
+        if FEATURES.all_enabled(NEW_UI | FAST_PATH):
+            ...
+        log.info('features=%s', FEATURES.fingerprint())
+
+    Mask checks ignore :func:`~oscar.flag.override`.
+    '''
+
+    def __init__(self, flagset):
+        '''
+        :type flagset: oscar.flag.NamespaceFlagSet
+        :param flagset: namespace the flags are declared in
+        '''
+        self.flagset = flagset
+        #: Value of each flag, or its default if unset, by bit.
+        self.bits = 0
+        #: Bits of the flags that are set.
+        self.set_bits = 0
+        self.masks = dict()
+        self._defaults = 0
+        # Reentrant: declaring may restore a pending value into the group.
+        self._lock = threading.RLock()
+
+    def declare(self, name, description, default=False):
+        '''Declare flag ``name`` in the group's namespace.
+
+        :type name: str
+        :type description: str
+        :type default: bool
+        :rtype: int
+        :returns: the flag's mask
+        :raises FlagException: on flag redefinition or a non-boolean default
+        '''
+        if not isinstance(default, bool):
+            raise flag.FlagException('default of %s must be a bool' % name)
+        with self._lock:
+            mask = 1 << len(self.masks)
+            # The default goes in first, declaring may restore a value.
+            if default:
+                self._defaults |= mask
+                self.bits |= mask
+            try:
+                setattr(self.flagset, name, GroupBool(self, mask, description, default))
+            except flag.FlagException:
+                self._defaults &= ~mask
+                self.bits &= ~mask
+                raise
+            self.masks[name] = mask
+        return mask
+
+    def mask(self, *names):
+        '''Returns the combined mask of flags ``names``.
+
+        :rtype: int
+        :raises KeyError: if a flag is not in the group
+        '''
+        mask = 0
+        for name in names:
+            mask |= self.masks[name]
+        return mask
+
+    def enabled(self, name):
+        '''
+        :type name: str
+        :rtype: bool
+        '''
+        return bool(self.bits & self.masks[name])
+
+    def all_enabled(self, mask):
+        '''Returns whether all flags in ``mask`` are enabled.
+
+        :type mask: int
+        :rtype: bool
+        '''
+        return self.bits & mask == mask
+
+    def any_enabled(self, mask):
+        '''Returns whether any flag in ``mask`` is enabled.
+
+        :type mask: int
+        :rtype: bool
+        '''
+        return bool(self.bits & mask)
+
+    def update(self, **values):
+        '''Set several flags at once.
+
+        Readers see either none or all of the changes. Values are used
+        as booleans rather than parsed, and :const:`~oscar.flag.UNSET`
+        unsets a flag.
+
+        :raises KeyError: if a flag is not in the group
+        :raises FlagException: if flags are frozen, or shared with the
+            flag set a :meth:`~oscar.flag.GlobalFlagSet.clone` was made from
+        '''
+        if self.flagset._frozen is not None:
+            raise flag.FlagException('cannot update flags: flags are frozen')
+        globalflags = self.flagset._globalflags
+        assign = unset = enabled = 0
+        for name, value in values.items():
+            mask = self.masks[name]
+            if globalflags is not None and self.flagset._flags[name] in globalflags._shared:
+                raise flag.FlagException(
+                    'cannot update %s.%s in a clone: its state is shared' % (
+                        self.flagset._namespace, name))
+            if value is flag.UNSET:
+                unset |= mask
+            else:
+                assign |= mask
+                if value:
+                    enabled |= mask
+        with self._lock:
+            self.set_bits = self.set_bits & ~unset | assign
+            self.bits = self.bits & ~(assign | unset) | enabled | self._defaults & unset
+        if globalflags is not None:
+            for name in values:
+                globalflags._changed(self.flagset._flags[name])
+
+    def _assign(self, mask, enabled):
+        with self._lock:
+            self.set_bits |= mask
+            self.bits = self.bits & ~mask | enabled
+
+    def _reset(self, mask):
+        with self._lock:
+            self.set_bits &= ~mask
+            self.bits = self.bits & ~mask | self._defaults & mask
+
+    def fingerprint(self):
+        '''Returns :attr:`bits` as a short hex string, e.g. for logs and traces.
+
+        :rtype: str
+        '''
+        return '%0*x' % (max(1, (len(self.masks) + 3) // 4), self.bits)
+
+
 class Json(flag.Var):
 
     '''Flag that takes valid JSON string'''
@@ -59,9 +607,232 @@ class Json(flag.Var):
     type_str = 'JSON'
 
     def set(self, value):
+        import json
+
         self.value = json.loads(value)
 
 
+# Stands in for attributes missing from RuleSet.evaluate(), which no
+# condition value equals.
+_MISSING = object()
+
+
+class RuleSet(object):
+
+    '''Rules mapping request attributes to values, compiled for lookup.
+
+    ``rules`` is a list of ``{"when": {attribute: value, ...}, "value":
+    value}`` dicts, checked in order, where the first rule whose
+    conditions all hold wins. A condition holds if the attribute equals
+    its value, or is one of its values if it is a list. A rule without
+    ``"when"`` always matches.
+
+    Rules are compiled into one hash index per attribute, mapping each
+    attribute value to a bitmask of the rules it satisfies, so
+    evaluating costs one lookup per attribute regardless of the number
+    of rules. Results are memoized for the last :attr:`cache_size`
+    distinct attribute combinations.
+    '''
+
+    def __init__(self, rules, cache_size=1024):
+        '''
+        :type rules: list[dict]
+        :type cache_size: int
+        :raises ValueError: on malformed rules
+        '''
+        if not isinstance(rules, list):
+            raise ValueError('rules must be a list')
+        conditions = []
+        for rule in rules:
+            if not isinstance(rule, dict) or 'value' not in rule:
+                raise ValueError('rule must be an object with a value: %r' % (rule,))
+            when = rule.get('when', {})
+            if not isinstance(when, dict):
+                raise ValueError('rule conditions must be an object: %r' % (when,))
+            conditions.append(when)
+        self.rules = rules
+        self.cache_size = cache_size
+        self._attributes = tuple(sorted(set(
+            attribute for when in conditions for attribute in when)))
+        index = []
+        for attribute in self._attributes:
+            values, wildcard = {}, 0
+            for i, when in enumerate(conditions):
+                if attribute not in when:
+                    wildcard |= 1 << i
+                    continue
+                expected = when[attribute]
+                for value in expected if isinstance(expected, list) else [expected]:
+                    try:
+                        values[value] = values.get(value, 0) | 1 << i
+                    except TypeError:
+                        raise ValueError('condition value for %s must be hashable: %r' % (
+                            attribute, value))
+            index.append((attribute, values, wildcard))
+        self._index = tuple(index)
+        self._all = (1 << len(rules)) - 1
+        self._cache = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def evaluate(self, attributes=None, **kwargs):
+        '''Returns the value of the first matching rule, or ``None``.
+
+        Attributes are given as a dict, keyword arguments or both, and
+        must be hashable. Missing attributes only match rules without a
+        condition on them::
+
+            FLAGS.rate_limit.evaluate(region='eu', plan=account.plan)
+
+        :type attributes: None or dict
+        :rtype: object
+        '''
+        if kwargs:
+            attributes = dict(attributes or (), **kwargs)
+        elif attributes is None:
+            attributes = {}
+        key = tuple(attributes.get(attribute, _MISSING) for attribute in self._attributes)
+        with self._lock:
+            if key in self._cache:
+                value = self._cache.pop(key)
+                self._cache[key] = value
+                return value
+        value = self._match(key)
+        if self.cache_size > 0:
+            with self._lock:
+                self._cache[key] = value
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+        return value
+
+    def _match(self, key):
+        matching = self._all
+        for value, (_, values, wildcard) in zip(key, self._index):
+            matching &= values.get(value, 0) | wildcard
+            if not matching:
+                return None
+        # The lowest set bit is the first matching rule.
+        return self.rules[(matching & -matching).bit_length() - 1]['value']
+
+    def __getstate__(self):
+        return (self.rules, self.cache_size)
+
+    def __setstate__(self, state):
+        self.__init__(*state)
+
+    def __eq__(self, other):
+        return isinstance(other, RuleSet) and self.rules == other.rules
+
+    def __ne__(self, other):
+        return not self == other
+
+    __hash__ = None
+
+    def __str__(self):
+        import json
+
+        return json.dumps(self.rules, sort_keys=True, separators=(',', ':'))
+
+    def __repr__(self):
+        return '<RuleSet of %d rules>' % len(self.rules)
+
+
+class Rules(flag.Var):
+
+    '''Flag whose value depends on request attributes.
+
+    The flag is set to a JSON list of rules (see :class:`RuleSet`),
+    which may span several indented lines in an ini file::
+
+        [pricing]
+        rate_limit = [{"when": {"plan": "free"}, "value": 10},
+                      {"when": {"region": ["eu", "uk"]}, "value": 100},
+                      {"value": 1000}]
+
+    and holds the compiled :class:`RuleSet`::
+
+        FLAGS.rate_limit = flag_contrib.Rules('requests per second')
+        limit = FLAGS.rate_limit.evaluate(plan=account.plan, region=region)
+
+    A list of rules or a JSON string given as ``default`` is compiled
+    at declaration.
+    '''
+
+    type_str = 'Rules'
+
+    def __init__(self, description, default=None, secure=False, cache_size=1024):
+        super(Rules, self).__init__(description, default, secure)
+        self.cache_size = cache_size
+        if isinstance(default, six.string_types):
+            self.set(default)
+            self.default = self.value
+            del self.value
+        elif isinstance(default, list):
+            self.default = RuleSet(default, cache_size)
+
+    def set(self, value):
+        import json
+
+        # pylint: disable=attribute-defined-outside-init
+        self.value = RuleSet(json.loads(value), self.cache_size)
+
+    def evaluate(self, attributes=None, **kwargs):
+        '''Returns :meth:`RuleSet.evaluate`, or ``None`` if the flag has no value.
+
+        :type attributes: None or dict
+        :rtype: object
+        '''
+        rules = self.get()
+        if rules is None:
+            return None
+        return rules.evaluate(attributes, **kwargs)
+
+
+# Per-thread list of pending (logger name, level) pairs while a
+# batched_log_levels() block is active.
+_LOG_LEVEL_BATCH = threading.local()
+
+
+@contextlib.contextmanager
+def batched_log_levels():
+    '''Defer :class:`LogLevel` logger updates made in the block.
+
+    :meth:`logging.Logger.setLevel` clears the logging module's level
+    cache for every logger on each call. Wrapping a parse or reload
+    collects the changes made by :class:`LogLevel` flags in the current
+    thread and applies them in order when the block exits, taking the
+    logging lock and clearing the cache once::
+
+        with flag_contrib.batched_log_levels():
+            flag.parse_environment(os.environ.items())
+            flag.parse_commandline(sys.argv[1:])
+
+    Nested blocks are applied by the outermost one.
+    '''
+    if getattr(_LOG_LEVEL_BATCH, 'pending', None) is not None:
+        yield
+        return
+    _LOG_LEVEL_BATCH.pending = []
+    try:
+        yield
+    finally:
+        pending, _LOG_LEVEL_BATCH.pending = _LOG_LEVEL_BATCH.pending, None
+        _apply_log_levels(pending)
+
+
+def _apply_log_levels(levels):
+    import logging
+
+    if not levels:
+        return
+    # pylint: disable=protected-access
+    with logging._lock:
+        for name, level in levels:
+            logging.getLogger(name).level = level
+        clear_cache = getattr(logging.Logger.manager, '_clear_cache', None)
+        if clear_cache is not None:
+            clear_cache()
+
+
 class LogLevel(flag.Var):
 
     '''Flag that lets you specify the logging level for a given logger.
@@ -73,12 +844,21 @@ class LogLevel(flag.Var):
             __name__, 'log level for loggers in this module')
         FLAGS.sqlalchemy_log_level = flag_contrib.LogLevel(
             'sqlalchemy.engine', 'log level for sqlalchemy')
+
+    Levels are applied to the logger immediately, or when the enclosing
+    :func:`batched_log_levels` block exits. Secure values from the
+    environment are decoded when parsed, so they reach the logger.
     '''
 
+    secure_lazily = False
+    shared_state = True
+
     class Level(flag.Var):
         type_str = 'String'
 
         def coerce(self, value):
+            import logging
+
             level = logging.getLevelName(value.upper())
             if not isinstance(level, six.integer_types):
                 raise ValueError('Unknown log level: %r' % level)
@@ -97,18 +877,33 @@ class LogLevel(flag.Var):
         self.inner_value = inner_type(description, default, False)
         self.type_str = inner_type.type_str
 
+        if default is not None:
+            self.set(default)
+
+    @property
+    def long_description(self):
+        import logging
+
         choices = {logging.CRITICAL, logging.FATAL, logging.ERROR,
                    logging.WARNING, logging.WARN, logging.INFO, logging.DEBUG}
-        self.long_description = '\n'.join(
-            logging.getLevelName(x) for x in choices)
+        return '\n'.join(logging.getLevelName(x) for x in choices)
 
-        if default is not None:
-            self.set(default)
+    def coerce_value(self, value):
+        # Without setting the logger's level.
+        return self.inner_value.coerce(value)
 
     def set(self, value):
         self.inner_value.set(value)
         self.value = self.inner_value.get()
-        logging.getLogger(self.logger_name).setLevel(self.value)
+        pending = getattr(_LOG_LEVEL_BATCH, 'pending', None)
+        if pending is None:
+            import logging
+
+            logging.getLogger(self.logger_name).setLevel(self.value)
+        else:
+            pending.append((self.logger_name, self.value))
 
     def __str__(self):
+        import logging
+
         return logging.getLevelName(self.value)
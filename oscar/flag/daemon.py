@@ -0,0 +1,340 @@
+'''Serve resolved flag values to other processes on the host over a unix socket.
+
+On hosts running many processes of the same program, one daemon parses
+the environment and ini files once and owns the values; every other
+process populates its flags from the daemon in a single round trip and
+then receives updates as the daemon's flags change::
+
+  # daemon
+  flag.parse_environment(os.environ.items())
+  flag.parse_ini(open('/etc/my_service.ini'))
+  daemon.FlagServer('/run/my_service/flags.sock').serve_forever()
+
+  # each worker, after or before importing flag declaring modules
+  daemon.FlagClient('/run/my_service/flags.sock').subscribe()
+
+Requests are JSON. Values are sent back in the format of
+:meth:`~oscar.flag.GlobalFlagSet.dump_values`, which is pickled, so
+clients must trust the daemon: the socket is created readable and
+writable by its owner only, and must not be exposed to untrusted
+processes.
+'''
+import json
+import os
+import socket
+import struct
+import threading
+
+import six
+from six.moves import cPickle as pickle
+from six.moves import socketserver
+
+from oscar import flag
+
+_LENGTH = struct.Struct('>I')
+
+
+def _send(sock, message):
+    data = pickle.dumps(message, pickle.HIGHEST_PROTOCOL)
+    sock.sendall(_LENGTH.pack(len(data)) + data)
+
+
+def _recv_exactly(sock, size):
+    chunks = []
+    while size:
+        chunk = sock.recv(size)
+        if not chunk:
+            raise EOFError('connection closed')
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b''.join(chunks)
+
+
+def _recv_data(sock):
+    size, = _LENGTH.unpack(_recv_exactly(sock, _LENGTH.size))
+    return _recv_exactly(sock, size)
+
+
+def _recv(sock):
+    return pickle.loads(_recv_data(sock))
+
+
+def _send_request(sock, kind, namespaces):
+    data = json.dumps([kind, namespaces]).encode('utf-8')
+    sock.sendall(_LENGTH.pack(len(data)) + data)
+
+
+def _recv_request(sock):
+    '''Returns ``(kind, namespaces)``, or ``None`` for a malformed request.'''
+    try:
+        request = json.loads(_recv_data(sock).decode('utf-8'))
+    except ValueError:
+        return None
+    if not isinstance(request, list) or len(request) != 2:
+        return None
+    kind, namespaces = request
+    if namespaces is not None and not (
+            isinstance(namespaces, list) and
+            all(isinstance(namespace, six.string_types) for namespace in namespaces)):
+        return None
+    return kind, namespaces
+
+
+class _Subscription(object):
+
+    '''Flags changed since the last update sent to one subscriber.'''
+
+    def __init__(self, namespaces):
+        self.namespaces = None if namespaces is None else frozenset(namespaces)
+        self.changed = set()
+        self.closed = False
+        self.cond = threading.Condition()
+
+    def notify(self, namespace, name):
+        if self.namespaces is None or namespace in self.namespaces:
+            with self.cond:
+                self.changed.add((namespace, name))
+                self.cond.notify()
+
+    def close(self):
+        with self.cond:
+            self.closed = True
+            self.cond.notify()
+
+    def wait(self):
+        '''Returns the changed ``(namespace, name)`` pairs, or ``None`` once closed.'''
+        with self.cond:
+            while not self.changed and not self.closed:
+                self.cond.wait()
+            if self.closed:
+                return None
+            changed, self.changed = self.changed, set()
+            return changed
+
+
+class _Handler(socketserver.BaseRequestHandler):
+
+    def handle(self):
+        try:
+            while True:
+                request = _recv_request(self.request)
+                if request is None:
+                    _send(self.request, ('error', 'malformed request'))
+                elif request[0] == 'fetch':
+                    _send(self.request, ('values', self.server.dump(request[1])))
+                elif request[0] == 'subscribe':
+                    self._subscribe(request[1])
+                    return
+                else:
+                    _send(self.request, ('error', 'unknown request %r' % (request[0],)))
+        except (EOFError, IOError, OSError):
+            return
+
+    def _subscribe(self, namespaces):
+        subscription = _Subscription(namespaces)
+        self.server.subscribe(subscription)
+        try:
+            # Changes made between subscribing and the dump are sent twice.
+            _send(self.request, ('values', self.server.dump(namespaces)))
+            while True:
+                changed = subscription.wait()
+                if changed is None:
+                    return
+                _send(self.request, ('update',) + self.server.changes(changed))
+        finally:
+            self.server.unsubscribe(subscription)
+
+
+class FlagServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+
+    '''Threaded unix socket server for the values of ``globalflags``.
+
+    Clients may fetch the set flags of some or all namespaces, or
+    subscribe to them, after which the server pushes the flags set or
+    unset through ``globalflags``, batching changes made while the
+    previous update was being sent.
+    '''
+
+    daemon_threads = True
+
+    def __init__(self, path, globalflags=None):
+        '''
+        :type path: str
+        :param path: path of the socket; an existing file there is replaced
+        :type globalflags: None or oscar.flag.GlobalFlagSet
+        :param globalflags: defaults to :const:`oscar.flag.GLOBAL_FLAGS`
+        '''
+        self.globalflags = flag.GLOBAL_FLAGS if globalflags is None else globalflags
+        self._subscriptions = set()
+        self._lock = threading.Lock()
+        if os.path.exists(path):
+            os.unlink(path)
+        # Bound with owner-only permissions, rather than chmod-ed after.
+        umask = os.umask(0o177)
+        try:
+            socketserver.UnixStreamServer.__init__(self, path, _Handler)
+        finally:
+            os.umask(umask)
+        self.globalflags.add_listener(self._changed)
+
+    def dump(self, namespaces):
+        '''Returns :meth:`~oscar.flag.GlobalFlagSet.dump_values` for ``namespaces``.
+
+        :type namespaces: None or list[str]
+        :rtype: bytes
+        '''
+        return self.globalflags.dump_values(namespaces)
+
+    def changes(self, changed):
+        '''Returns the values of set flags and the names of unset flags in ``changed``.
+
+        :type changed: set[tuple(str, str)]
+        :rtype: tuple(bytes, list[tuple(str, str)])
+        '''
+        entries, unset = [], []
+        for namespace, name in sorted(changed):
+            var = self.globalflags.get(namespace, name)
+            if var.is_set():
+                entries.append((namespace, name, var.secure, var.serialize()))
+            else:
+                unset.append((namespace, name))
+        return pickle.dumps(entries, pickle.HIGHEST_PROTOCOL), unset
+
+    def subscribe(self, subscription):
+        with self._lock:
+            self._subscriptions.add(subscription)
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscriptions.discard(subscription)
+
+    def _changed(self, namespace, name, _):
+        with self._lock:
+            subscriptions = list(self._subscriptions)
+        for subscription in subscriptions:
+            subscription.notify(namespace, name)
+
+    def server_close(self):
+        '''Close the socket and end all subscriptions.'''
+        self.globalflags.remove_listener(self._changed)
+        with self._lock:
+            subscriptions = list(self._subscriptions)
+        for subscription in subscriptions:
+            subscription.close()
+        socketserver.UnixStreamServer.server_close(self)
+        try:
+            os.unlink(self.server_address)
+        except OSError:
+            pass
+
+
+def serve_in_background(path, globalflags=None):
+    '''Start a :class:`FlagServer` in a daemon thread.
+
+    :type path: str
+    :type globalflags: None or oscar.flag.GlobalFlagSet
+    :rtype: FlagServer
+    :returns: the running server; call ``shutdown()`` and ``server_close()`` to stop it
+    '''
+    server = FlagServer(path, globalflags)
+    thread = threading.Thread(target=server.serve_forever, name='oscar.flag.daemon')
+    thread.daemon = True
+    thread.start()
+    return server
+
+
+class FlagClient(object):
+
+    '''Populates ``globalflags`` from a :class:`FlagServer`.
+
+    Values for flags that are not declared yet are applied when they
+    are declared (see :meth:`~oscar.flag.GlobalFlagSet.load_values`).
+    '''
+
+    def __init__(self, path, globalflags=None):
+        '''
+        :type path: str
+        :type globalflags: None or oscar.flag.GlobalFlagSet
+        :param globalflags: defaults to :const:`oscar.flag.GLOBAL_FLAGS`
+        '''
+        self.path = path
+        self.globalflags = flag.GLOBAL_FLAGS if globalflags is None else globalflags
+        self._sock = None
+        self._thread = None
+
+    def _connect(self):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            sock.connect(self.path)
+        except Exception:
+            sock.close()
+            raise
+        return sock
+
+    def fetch(self, namespaces=None):
+        '''Set flags to the server's values once.
+
+        :type namespaces: None or list[str]
+        :param namespaces: only fetch flags in these namespaces
+        '''
+        sock = self._connect()
+        try:
+            _send_request(sock, 'fetch', namespaces)
+            self.globalflags.load_values(_recv(sock)[1])
+        finally:
+            sock.close()
+
+    def subscribe(self, namespaces=None):
+        '''Set flags to the server's values and keep them updated.
+
+        The initial values are loaded before this returns. Updates are
+        applied from a daemon thread until :meth:`close` is called or
+        the server goes away; they are dropped once ``globalflags`` is
+        frozen.
+
+        :type namespaces: None or list[str]
+        :param namespaces: only fetch flags in these namespaces
+        '''
+        sock = self._connect()
+        try:
+            _send_request(sock, 'subscribe', namespaces)
+            self.globalflags.load_values(_recv(sock)[1])
+        except Exception:
+            sock.close()
+            raise
+        self._sock = sock
+        self._thread = threading.Thread(target=self._receive, name='oscar.flag.daemon.client')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def _receive(self):
+        sock = self._sock
+        try:
+            while True:
+                _, data, unset = _recv(sock)
+                try:
+                    self._apply(data, unset)
+                except flag.FlagException:
+                    pass
+        except (EOFError, IOError, OSError):
+            return
+
+    def _apply(self, data, unset):
+        self.globalflags.load_values(data)
+        for namespace, name in unset:
+            flagset = self.globalflags.namespace(namespace)
+            if name in flagset._flags:
+                setattr(flagset, name, flag.UNSET)
+            else:
+                flagset._pending.pop(name, None)
+
+    def close(self):
+        '''Stop receiving updates.'''
+        if self._sock is not None:
+            try:
+                self._sock.shutdown(socket.SHUT_RDWR)
+            except (IOError, OSError):
+                pass
+            self._sock.close()
+            self._thread.join()
+            self._sock = self._thread = None
@@ -0,0 +1,53 @@
+import sys
+
+from oscar import flag
+
+
+def initializer(data, user_initializer=None, user_initargs=()):
+    '''Process pool initializer restoring flag values from the parent.
+
+    Restores ``data`` from :meth:`~oscar.flag.GlobalFlagSet.dump_values`
+    into :const:`~oscar.flag.GLOBAL_FLAGS` in one batch, then calls
+    ``user_initializer(*user_initargs)`` if given. Under the ``spawn``
+    and ``forkserver`` start methods the parent's main script is
+    imported as ``__mp_main__``, so values of flags declared in
+    ``flag.namespace(__name__)`` there are restored to that namespace.
+
+    :type data: bytes
+    :type user_initializer: None or F(...)
+    :type user_initargs: tuple
+    '''
+    aliases = {'__main__': '__mp_main__'} if '__mp_main__' in sys.modules else None
+    flag.GLOBAL_FLAGS.load_values(data, aliases)
+    if user_initializer is not None:
+        user_initializer(*user_initargs)
+
+
+def initializer_kwargs(user_initializer=None, user_initargs=()):
+    '''Returns ``initializer`` and ``initargs`` keyword arguments for a pool.
+
+    The set flags of :const:`~oscar.flag.GLOBAL_FLAGS` are serialized
+    once in the parent and restored in each worker without re-parsing,
+    regardless of the start method::
+
+      from concurrent import futures
+      import multiprocessing
+
+      from oscar.flag import pool as flag_pool
+
+      executor = futures.ProcessPoolExecutor(64, **flag_pool.initializer_kwargs())
+      workers = multiprocessing.Pool(64, **flag_pool.initializer_kwargs())
+
+    :class:`~concurrent.futures.ProcessPoolExecutor` takes these
+    arguments from Python 3.7 on. Flags set in the parent after this is
+    called are not propagated.
+
+    :type user_initializer: None or F(...)
+    :param user_initializer: initializer to chain after restoring flags
+    :type user_initargs: tuple
+    :rtype: dict
+    '''
+    return {
+        'initializer': initializer,
+        'initargs': (flag.GLOBAL_FLAGS.dump_values(), user_initializer, user_initargs),
+    }
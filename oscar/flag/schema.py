@@ -0,0 +1,201 @@
+'''JSON Schema export for declared flags, and offline checks against it.
+
+The schema describes a config document mapping namespaces to objects
+of flag values, e.g. ``{"foo.bar": {"baz": 42}}``, which is also the
+shape of an ini file parsed by :func:`oscar.flag.parse_ini`.
+'''
+import datetime
+import json
+import weakref
+
+from six.moves import configparser
+
+from oscar import flag
+
+SCHEMA_DRAFT = 'http://json-schema.org/draft-07/schema#'
+
+_JSON_TYPES = {
+    'String': 'string',
+    'Int': 'integer',
+    'Float': 'number',
+    'Bool': 'boolean',
+}
+
+_BOOL_VALUES = {
+    't': True, 'true': True, 'yes': True, 'on': True, '1': True,
+    'f': False, 'false': False, 'no': False, 'off': False, '0': False,
+}
+
+_COERCE = {
+    'string': lambda value: value,
+    'integer': int,
+    'number': float,
+    'boolean': lambda value: _BOOL_VALUES[value.lower()],
+}
+
+# GlobalFlagSet -> {namespace: (number of flags, schema)}. Flags cannot be
+# removed or redeclared, so an unchanged count means an unchanged namespace.
+_CACHE = weakref.WeakKeyDictionary()
+
+
+def _json_value(value):
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        return value.isoformat()
+    if hasattr(type(value), '__members__'):
+        # enum.Enum member.
+        return value.value
+    try:
+        json.dumps(value)
+    except (TypeError, ValueError):
+        return str(value)
+    return value
+
+
+def flag_schema(var):
+    '''Returns the JSON Schema for a single flag.
+
+    Flags are described by their ``type_str``; types without a JSON
+    equivalent accept any value. :class:`~oscar.flag.List` becomes an
+    ``array`` with its separator in ``x-separator``, flags with
+    ``choices`` an ``enum``, and ``minimum``/``maximum`` bounds are kept.
+
+    :type var: oscar.flag.Var
+    :rtype: dict
+    '''
+    schema = {'description': var.description, 'x-flag-type': var.type_str}
+    if isinstance(var, flag.List):
+        schema['type'] = 'array'
+        schema['items'] = flag_schema(var.inner_value)
+        del schema['items']['description']
+        schema['x-separator'] = var.separator
+    elif var.type_str in _JSON_TYPES:
+        schema['type'] = _JSON_TYPES[var.type_str]
+    choices = getattr(var, 'choices', None)
+    if choices is not None:
+        schema['enum'] = sorted((_json_value(choice) for choice in choices), key=repr)
+    for bound in ('minimum', 'maximum'):
+        if getattr(var, bound, None) is not None:
+            schema[bound] = getattr(var, bound)
+    if var.default is not None and var.default is not flag.REQUIRED and not var.secure:
+        schema['default'] = _json_value(var.default)
+    if var.secure:
+        schema['writeOnly'] = True
+    return schema
+
+
+def namespace_schema(globalflags, namespace):
+    '''Returns the JSON Schema for one namespace, cached until flags are declared.
+
+    :type globalflags: oscar.flag.GlobalFlagSet
+    :type namespace: str
+    :rtype: dict
+    '''
+    flags = globalflags.namespace_flags[namespace]._flags
+    cache = _CACHE.setdefault(globalflags, {})
+    cached = cache.get(namespace)
+    if cached is not None and cached[0] == len(flags):
+        return cached[1]
+    flags = dict(flags)
+    with globalflags._descriptions_loaded():
+        properties = dict((name, flag_schema(var)) for name, var in flags.items())
+    schema = {
+        'type': 'object',
+        'properties': properties,
+        'additionalProperties': False,
+    }
+    required = sorted(name for name, var in flags.items() if var.default is flag.REQUIRED)
+    if required:
+        schema['required'] = required
+    cache[namespace] = (len(flags), schema)
+    return schema
+
+
+def export_schema(globalflags=None):
+    '''Returns the JSON Schema for all flags in ``globalflags``.
+
+    Only namespaces with flags declared since the last export are
+    regenerated.
+
+    :type globalflags: None or oscar.flag.GlobalFlagSet
+    :param globalflags: defaults to :const:`oscar.flag.GLOBAL_FLAGS`
+    :rtype: dict
+    '''
+    if globalflags is None:
+        globalflags = flag.GLOBAL_FLAGS
+    # Offloaded descriptions are read from disk once, not once per flag.
+    with globalflags._descriptions_loaded():
+        properties = dict(
+            (namespace, namespace_schema(globalflags, namespace))
+            for namespace in list(globalflags.namespace_flags))
+    return {
+        '$schema': SCHEMA_DRAFT,
+        'type': 'object',
+        'properties': properties,
+        'additionalProperties': False,
+    }
+
+
+def _check_value(schema, value):
+    '''Raise :exc:`ValueError` if the string ``value`` doesn't match ``schema``.'''
+    if schema.get('type') == 'array':
+        for part in value.split(schema['x-separator']):
+            _check_value(schema['items'], part)
+        return
+    coerce = _COERCE.get(schema.get('type'))
+    if coerce is None:
+        return
+    try:
+        value = coerce(value)
+    except (KeyError, ValueError):
+        raise ValueError('not a valid %s' % schema['type'])
+    if 'enum' in schema and value not in schema['enum']:
+        raise ValueError('not a valid choice')
+    if 'minimum' in schema and value < schema['minimum']:
+        raise ValueError('less than %s' % schema['minimum'])
+    if 'maximum' in schema and value > schema['maximum']:
+        raise ValueError('greater than %s' % schema['maximum'])
+
+
+def check_ini(schema, file_p, check_required=False):
+    '''Check an ini file against a schema from :func:`export_schema`.
+
+    This only needs the schema (e.g. loaded from a JSON file), so
+    config files can be checked without importing the modules that
+    declare the flags.
+
+    :type schema: dict
+    :type file_p: file
+    :type check_required: bool
+    :param check_required: also report required flags missing from the file
+    :rtype: oscar.flag.ValidationReport
+    '''
+    report = flag.ValidationReport()
+    config = configparser.ConfigParser()
+    config.optionxform = str
+    try:
+        getattr(config, 'read_file', getattr(config, 'readfp', None))(file_p)
+    except configparser.Error as exc:
+        report.add('malformed', 'ini', getattr(file_p, 'name', '<ini>'), str(exc))
+        return report
+    namespaces = schema['properties']
+    for section in config.sections():
+        if section not in namespaces:
+            report.add('unknown', 'ini', section, 'unknown namespace: %s' % section)
+            continue
+        properties = namespaces[section]['properties']
+        for name, value in config.items(section):
+            qualified = '%s.%s' % (section, name)
+            if name not in properties:
+                report.add('unknown', 'ini', qualified, 'unknown flag: %s' % qualified)
+                continue
+            try:
+                _check_value(properties[name], value)
+            except ValueError as exc:
+                report.add('malformed', 'ini', qualified, 'invalid value %r: %s' % (value, exc))
+    if check_required:
+        for namespace, namespace_properties in sorted(namespaces.items()):
+            for name in namespace_properties.get('required', ()):
+                if not (config.has_section(namespace) and config.has_option(namespace, name)):
+                    report.add('missing', 'ini', '%s.%s' % (namespace, name),
+                               'missing required flag')
+    return report
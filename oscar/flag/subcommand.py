@@ -0,0 +1,211 @@
+'''Subcommands with their own flags, declared and parsed on demand.
+
+A multi-tool CLI (``tool deploy|migrate|report ...``) registers the
+modules declaring each subcommand's flags with :class:`Subcommands`.
+Only the chosen subcommand's modules are imported, their flags are
+declared in a :class:`SubcommandFlagSet` rather than in the parent flag
+set, and only that subcommand's flags are parsed::
+
+  from oscar.flag import subcommand
+
+  COMMANDS = subcommand.Subcommands()
+  COMMANDS.add('deploy', ['tool.deploy'], 'deploy a release')
+  COMMANDS.add('migrate', ['tool.migrate'], 'run database migrations')
+
+  def main():
+      name, flags = COMMANDS.parse(sys.argv[1:])
+      sys.modules['tool.' + name].main(flags.args)
+
+Global flags precede the subcommand name, the subcommand's own flags
+and global flags may follow it.
+'''
+import importlib
+import sys
+import threading
+
+from oscar import flag
+
+# Swapping GLOBAL_FLAGS while importing is process-wide.
+_IMPORT_LOCK = threading.Lock()
+
+
+class SubcommandFlagSet(flag.GlobalFlagSet):
+
+    '''Flag set for one subcommand that inherits the flags of its ``parent``.
+
+    Flags are looked up in the subcommand's namespaces first and then in
+    the parent's; short names declared in both are ambiguous. Existing
+    parent namespaces are shared rather than shadowed, so flags declared
+    in them are declared in the parent.
+    '''
+
+    def __init__(self, parent, usage=flag.default_usage, usage_long=flag.default_usage_long):
+        '''
+        :type parent: oscar.flag.GlobalFlagSet
+        :type usage: F(GlobalFlagSet)
+        :type usage_long: G(GlobalFlagSet)
+        '''
+        super(SubcommandFlagSet, self).__init__(usage, usage_long)
+        self.parent = parent
+
+    def namespace(self, namespace):
+        '''Returns the parent's namespace if it exists, else the subcommand's.
+
+        :type namespace: str
+        :rtype: oscar.flag.NamespaceFlagSet
+        '''
+        if namespace not in self.namespace_flags and namespace in self.parent.namespace_flags:
+            return self.parent.namespace_flags[namespace]
+        return super(SubcommandFlagSet, self).namespace(namespace)
+
+    def _changed(self, flag_obj):
+        if flag_obj in self._names:
+            super(SubcommandFlagSet, self)._changed(flag_obj)
+        else:
+            self.parent._changed(flag_obj)
+
+    def _lookup(self, name):
+        flag_obj = self._qualified.get(name) or self.parent._qualified.get(name)
+        if flag_obj is None:
+            if '.' in name:
+                raise KeyError(name)
+            flag_obj = self.get(self.find_short(name), name)
+        return flag_obj
+
+    def get(self, namespace, flag_name):
+        '''Like :meth:`GlobalFlagSet.get`, falling back to the parent.
+
+        :type namespace: str
+        :type flag_name: str
+        :rtype: oscar.flag.Var
+        :raises KeyError: if the flag is not found
+        '''
+        try:
+            return super(SubcommandFlagSet, self).get(namespace, flag_name)
+        except KeyError:
+            return self.parent.get(namespace, flag_name)
+
+    def find_short(self, flag_name):
+        '''Like :meth:`GlobalFlagSet.find_short`, also searching the parent.
+
+        :type flag_name: str
+        :rtype: str
+        :raises KeyError: if the flag is not found or ambiguous
+        '''
+        matches = self._short.get(flag_name, []) + self.parent._short.get(flag_name, [])
+        if len(matches) > 1:
+            raise KeyError('ambiguous flag \'%s\' in namespaces %s' % (flag_name, matches))
+        if len(matches) == 0:
+            raise KeyError('%s' % flag_name)
+        return matches[0]
+
+    def write_flags_long(self, out):
+        '''Prints the usage of the subcommand's and the parent's flags to ``out``.
+
+        :type out: file
+        '''
+        for namespace in sorted(set(self.namespace_flags) | set(self.parent.namespace_flags)):
+            out.write('%s:\n' % namespace)
+            if namespace in self.namespace_flags:
+                self.write_flags(out, namespace)
+            else:
+                self.parent.write_flags(out, namespace)
+            out.write('\n')
+
+    def check_required(self, sort=True):
+        '''Returns unset, required flags of the subcommand and the parent.
+
+        :type sort: bool
+        :rtype: list[tuple(str, str, Var)]
+        '''
+        nonset = (super(SubcommandFlagSet, self).check_required(False) +
+                  self.parent.check_required(False))
+        if sort:
+            nonset.sort(key=lambda entry: entry[:2])
+        return nonset
+
+
+class Subcommands(object):
+
+    '''Registry of subcommands and the modules declaring their flags.'''
+
+    def __init__(self, globalflags=None):
+        '''
+        :type globalflags: None or oscar.flag.GlobalFlagSet
+        :param globalflags: flag set for global flags, defaults to
+            :const:`oscar.flag.GLOBAL_FLAGS`
+        '''
+        self.globalflags = flag.GLOBAL_FLAGS if globalflags is None else globalflags
+        self.commands = dict()
+        self._flagsets = dict()
+
+    def add(self, name, modules, description=''):
+        '''Register subcommand ``name``.
+
+        :type name: str
+        :type modules: list[str]
+        :param modules: names of the modules declaring the subcommand's flags
+        :type description: str
+        '''
+        self.commands[name] = (list(modules), description)
+
+    def flagset(self, name):
+        '''Returns the flag set of subcommand ``name``, importing its modules once.
+
+        While the modules are imported, :const:`oscar.flag.GLOBAL_FLAGS`
+        is the subcommand's flag set, so flags declared through
+        :func:`oscar.flag.namespace` are declared there. Modules that
+        declare global flags should be imported beforehand.
+
+        :type name: str
+        :rtype: SubcommandFlagSet
+        :raises KeyError: if ``name`` is not registered
+        '''
+        flagset = self._flagsets.get(name)
+        if flagset is None:
+            modules, _ = self.commands[name]
+            flagset = SubcommandFlagSet(self.globalflags)
+            with _IMPORT_LOCK:
+                saved, flag.GLOBAL_FLAGS = flag.GLOBAL_FLAGS, flagset
+                try:
+                    for module in modules:
+                        importlib.import_module(module)
+                finally:
+                    flag.GLOBAL_FLAGS = saved
+            flagset = self._flagsets.setdefault(name, flagset)
+        return flagset
+
+    def parse(self, args):
+        '''Parse global flags, the subcommand name and the subcommand's flags.
+
+        :type args: list[str]
+        :rtype: tuple(str, SubcommandFlagSet)
+        :returns: the subcommand name and its flag set, whose ``args``
+            are the remaining positional arguments
+        :raises ParseException: on a missing or unknown subcommand
+        :raises KeyError: on unknown flag
+        '''
+        self.globalflags.parse_commandline(args)
+        rest = self.globalflags.args
+        if not rest:
+            raise flag.ParseException('missing subcommand, one of: %s' % self._names())
+        name = rest[0]
+        if name not in self.commands:
+            raise flag.ParseException('unknown subcommand %s, one of: %s' % (
+                name, self._names()))
+        flagset = self.flagset(name)
+        flagset.parse_commandline(rest[1:])
+        return name, flagset
+
+    def _names(self):
+        return ', '.join(sorted(self.commands))
+
+    def write_usage(self, out=None):
+        '''Prints the subcommands and their descriptions to ``out``.
+
+        :type out: None or file
+        :param out: defaults to :data:`sys.stderr`
+        '''
+        out = sys.stderr if out is None else out
+        for name in sorted(self.commands):
+            out.write('%s%s: %s\n' % (flag.INDENT, name, self.commands[name][1]))
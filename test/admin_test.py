@@ -0,0 +1,97 @@
+import json
+import os
+import shutil
+import socket
+import tempfile
+import unittest
+
+from six.moves.urllib import error as urlerror
+from six.moves.urllib import request as urlrequest
+
+from oscar import flag
+from oscar.flag import admin
+
+
+class AdminTest(unittest.TestCase):
+
+    def setUp(self):
+        self.FLAGS = flag.GlobalFlagSet()
+        self.foo_flags = self.FLAGS.namespace('foo')
+        self.foo_flags.bar = flag.Int('some int', 1)
+        self.foo_flags.password = flag.String('some secret', 'hunter2', secure=True)
+        self.foo_flags.name = flag.String('some string', flag.REQUIRED)
+
+    def test_state(self):
+        self.foo_flags.bar = '42'
+        self.assertEqual(admin.flag_state(self.FLAGS), {'foo': {
+            'bar': {'type': 'Int', 'set': True, 'value': 42, 'default': 1},
+            'name': {'type': 'String', 'set': False, 'value': flag.REQUIRED,
+                     'default': flag.REQUIRED},
+            'password': {'type': 'String', 'set': False, 'value': '<secure>',
+                         'default': '<secure>'},
+        }})
+
+    def test_derived_secure(self):
+        self.foo_flags.url = flag.Derived('some url', 'pg://u:${password}@h')
+        body, _ = admin.StateCache(self.FLAGS).get()
+        self.assertNotIn(b'hunter2', body)
+
+    def test_error(self):
+        self.foo_flags.url = flag.Derived('some url', 'pg://${nope}')
+        state = json.loads(admin.StateCache(self.FLAGS).get()[0].decode('utf-8'))
+        self.assertEqual(state['foo']['url']['value'], admin.ERROR)
+        self.assertIn('nope', state['foo']['url']['error'])
+        self.assertEqual(state['foo']['bar']['value'], 1)
+
+    def test_cache(self):
+        cache = admin.StateCache(self.FLAGS)
+        body, etag = cache.get()
+        self.assertIs(cache.get()[0], body)
+        self.assertNotIn(b'hunter2', body)
+        self.foo_flags.bar = '2'
+        new_body, new_etag = cache.get()
+        self.assertNotEqual(new_etag, etag)
+        self.assertEqual(json.loads(new_body.decode('utf-8'))['foo']['bar']['value'], 2)
+
+    def test_http(self):
+        server = admin.serve_in_background(('127.0.0.1', 0), self.FLAGS)
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        url = 'http://127.0.0.1:%d%s' % (server.server_address[1], admin.PATH)
+        response = urlrequest.urlopen(url)
+        etag = response.headers['ETag']
+        self.assertEqual(json.loads(response.read().decode('utf-8'))['foo']['bar']['value'], 1)
+        with self.assertRaises(urlerror.HTTPError) as ctx:
+            urlrequest.urlopen(urlrequest.Request(url, headers={'If-None-Match': etag}))
+        self.assertEqual(ctx.exception.code, 304)
+        self.foo_flags.bar = '3'
+        response = urlrequest.urlopen(urlrequest.Request(url, headers={'If-None-Match': etag}))
+        self.assertNotEqual(response.headers['ETag'], etag)
+        with self.assertRaises(urlerror.HTTPError) as ctx:
+            urlrequest.urlopen(url + 'x')
+        self.assertEqual(ctx.exception.code, 404)
+
+    def test_unix_socket(self):
+        tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmpdir)
+        path = os.path.join(tmpdir, 'flags.sock')
+        server = admin.serve_in_background(path, self.FLAGS)
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.addCleanup(client.close)
+        client.connect(path)
+        client.sendall(b'GET /flags HTTP/1.0\r\n\r\n')
+        response = b''
+        while True:
+            data = client.recv(4096)
+            if not data:
+                break
+            response += data
+        headers, body = response.split(b'\r\n\r\n', 1)
+        self.assertTrue(headers.startswith(b'HTTP/1.0 200'))
+        self.assertEqual(json.loads(body.decode('utf-8'))['foo']['bar']['value'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
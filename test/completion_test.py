@@ -0,0 +1,79 @@
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+
+from oscar import flag
+from oscar.flag import completion
+from oscar.flag import contrib
+
+
+class CompletionTest(unittest.TestCase):
+
+    def setUp(self):
+        self.FLAGS = flag.GlobalFlagSet()
+        foo_flags = self.FLAGS.namespace('foo')
+        foo_flags.bar = flag.Int('some int')
+        foo_flags.verbose = flag.Bool('some bool')
+        foo_flags.region = contrib.Choices(flag.String, 'region', ['east', 'west'], 'east')
+        bar_flags = self.FLAGS.namespace('bar')
+        bar_flags.bar = flag.Int('another int')
+        self.index = completion.build_index(self.FLAGS)
+        self.tmpdir = tempfile.mkdtemp()
+        self.index_path = os.path.join(self.tmpdir, 'index.json')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_flags(self):
+        self.assertEqual(completion.complete(self.index, 'prog --foo.'), [
+            '--foo.bar', '--foo.region', '--foo.verbose'])
+        # Ambiguous short names are only completed qualified.
+        self.assertEqual(completion.complete(self.index, 'prog --b'), ['--bar.bar'])
+        self.assertEqual(completion.complete(self.index, 'prog -ve'), ['-verbose'])
+        self.assertEqual(completion.complete(self.index, 'prog arg'), [])
+
+    def test_values(self):
+        self.assertEqual(completion.complete(self.index, 'prog --region='),
+                         ['--region=east', '--region=west'])
+        self.assertEqual(completion.complete(self.index, 'prog --region=w', 'bash'),
+                         ['west'])
+        self.assertEqual(completion.complete(self.index, 'prog -foo.verbose=t'),
+                         ['-foo.verbose=true'])
+        self.assertEqual(completion.complete(self.index, 'prog --region '),
+                         ['east', 'west'])
+        # '--verbose false' is verbose=True and a positional argument.
+        self.assertEqual(completion.complete(self.index, 'prog --verbose '), [])
+        self.assertEqual(completion.complete(self.index, 'prog -foo.verbose f'), [])
+
+    def test_write_index_cached(self):
+        completion.write_index(self.index_path, self.FLAGS)
+        mtime = os.stat(self.index_path).st_mtime
+        os.utime(self.index_path, (mtime - 10, mtime - 10))
+        completion.write_index(self.index_path, self.FLAGS)
+        self.assertEqual(os.stat(self.index_path).st_mtime, mtime - 10)
+        self.FLAGS.namespace('baz').qux = flag.String('some string')
+        completion.write_index(self.index_path, self.FLAGS)
+        self.assertIn('--qux', completion.load_index(self.index_path)['flags'])
+
+    def test_write_index_choices_changed(self):
+        completion.write_index(self.index_path, self.FLAGS)
+        self.FLAGS.get('foo', 'region').choices = ['east', 'north']
+        completion.write_index(self.index_path, self.FLAGS)
+        self.assertEqual(completion.load_index(self.index_path)['values']['--region'],
+                         ['east', 'north'])
+
+    def test_main(self):
+        with open(self.index_path, 'w') as index_file:
+            json.dump(self.index, index_file)
+        output = subprocess.check_output([
+            sys.executable, '-m', 'oscar.flag.completion', self.index_path, 'prog --foo.r'])
+        self.assertEqual(output.decode('utf-8').splitlines(), ['--foo.region'])
+
+    def test_script(self):
+        for shell in ('bash', 'zsh', 'fish'):
+            self.assertIn('oscar.flag.completion', completion.script(shell, 'my-tool', 'idx'))
+        self.assertRaises(ValueError, completion.script, 'tcsh', 'my-tool', 'idx')
@@ -1,5 +1,12 @@
+import base64
 import datetime
+import enum
+import json
 import logging
+import os
+import pickle
+import shutil
+import tempfile
 import unittest
 
 import six
@@ -45,6 +52,96 @@ class DateFlagTest(unittest.TestCase):
             date_flag.set('11-01-b2015')
 
 
+class BoundedTest(unittest.TestCase):
+
+    def test_bounded_int(self):
+        int_flag = contrib.BoundedInt('some int', minimum=1, maximum=10)
+        int_flag.set('10')
+        self.assertEqual(int_flag.get(), 10)
+        for value in ('0', '11', 'x'):
+            with self.assertRaises(ValueError):
+                int_flag.set(value)
+
+    def test_bounded_float(self):
+        float_flag = contrib.BoundedFloat('some float', minimum=0.5)
+        float_flag.set('1e6')
+        self.assertEqual(float_flag.get(), 1e6)
+        with self.assertRaises(ValueError):
+            float_flag.set('0.25')
+
+    def test_duration(self):
+        duration = contrib.Duration('timeout', '1s', maximum=3600)
+        self.assertEqual(duration.get(), 1.0)
+        for value, expected in (('250ms', 0.25), ('1m30s', 90.0), ('2.5', 2.5),
+                                ('1h', 3600.0), ('500us', 0.0005)):
+            duration.set(value)
+            self.assertAlmostEqual(duration.get(), expected)
+        for value in ('1h1s', '5 parsecs', 'ms', 'nan', 'inf', '-1', '1e400'):
+            with self.assertRaises(ValueError):
+                duration.set(value)
+
+    def test_byte_size(self):
+        size = contrib.ByteSize('cache size', minimum=1)
+        for value, expected in (('2GiB', 2 * 1024 ** 3), ('512MB', 512 * 1000 ** 2),
+                                ('10k', 10000), ('1.5Ki', 1536), ('42', 42),
+                                ('1.1k', 1100), ('2.0', 2),
+                                ('12345678901234567890', 12345678901234567890)):
+            size.set(value)
+            self.assertEqual(size.get(), expected)
+        for value in ('0', '2 GiBs', 'GiB', '1.5', '0.0001k'):
+            with self.assertRaises(ValueError):
+                size.set(value)
+
+    def test_bad_default(self):
+        with self.assertRaises(ValueError):
+            contrib.Duration('timeout', '2m', maximum=60)
+        with self.assertRaises(ValueError):
+            contrib.BoundedInt('some int', 500, maximum=10)
+        with self.assertRaises(ValueError):
+            contrib.Duration('timeout', -1.0)
+        with self.assertRaises(ValueError):
+            contrib.ByteSize('cache size', 1.5)
+        self.assertEqual(contrib.ByteSize('cache size', 2.0).default, 2)
+        self.assertIs(contrib.BoundedInt('some int', flag.REQUIRED, maximum=10).default,
+                      flag.REQUIRED)
+
+
+class RolloutTest(unittest.TestCase):
+
+    def test_percentage(self):
+        rollout = contrib.Rollout('new path', '25%', salt='new_path')
+        keys = ['user-%d' % i for i in range(10000)]
+        enabled = rollout.enabled_for_all(keys)
+        self.assertEqual(enabled, [rollout.enabled_for(key) for key in keys])
+        self.assertTrue(2000 < sum(enabled) < 3000)
+        # Raising the percentage keeps enabled keys enabled.
+        rollout.set('50')
+        more = rollout.enabled_for_all(keys)
+        self.assertTrue(all(more[i] for i, value in enumerate(enabled) if value))
+        rollout.set('0')
+        self.assertFalse(any(rollout.enabled_for_all(keys)))
+        rollout.set('100%')
+        self.assertTrue(all(rollout.enabled_for_all(keys)))
+
+    def test_stable(self):
+        first = contrib.Rollout('new path', 50, salt='a')
+        second = contrib.Rollout('new path', 50, salt='a')
+        other = contrib.Rollout('new path', 50, salt='b')
+        keys = list(range(1000))
+        self.assertEqual(first.enabled_for_all(keys), second.enabled_for_all(keys))
+        self.assertNotEqual(first.enabled_for_all(keys), other.enabled_for_all(keys))
+        state = pickle.loads(pickle.dumps(first.get()))
+        self.assertEqual(state, first.get())
+        self.assertEqual(state.enabled_for_all(keys), first.enabled_for_all(keys))
+
+    def test_invalid(self):
+        rollout = contrib.Rollout('new path')
+        self.assertFalse(rollout.enabled_for('key'))
+        for value in ('101', '-1', 'half'):
+            with self.assertRaises(ValueError):
+                rollout.set(value)
+
+
 class ChoicesTest(unittest.TestCase):
 
     def test_default_value(self):
@@ -75,6 +172,172 @@ class ChoicesTest(unittest.TestCase):
             '        2\n' +
             '        3\n'))
 
+    def test_long_description_lazy(self):
+        choices = contrib.Choices(flag.Int, 'pick a number', range(100000), 1)
+        self.assertNotIn('long_description', vars(choices))
+        self.assertEqual(choices.long_description.splitlines()[-1], '99999')
+
+    def test_secure_environment(self):
+        FLAGS = flag.GlobalFlagSet()
+        FLAGS.namespace('foo').region = contrib.Choices(
+            flag.String, 'region', ['east', 'west'], 'east')
+        FLAGS.parse_environment([('SECURED_SETTING_region', base64.b64encode(b'west'))])
+        self.assertEqual(FLAGS.namespace('foo').region, 'west')
+        self.assertFalse(FLAGS.get('foo', 'region').inner_value.is_set())
+
+
+class OffloadDescriptionsTest(unittest.TestCase):
+
+    def test_inner_values(self):
+        FLAGS = flag.GlobalFlagSet()
+        flags = FLAGS.namespace('foo')
+        flags.choice = contrib.Choices(flag.String, 'choice desc', ['a', 'b'], 'a')
+        flags.indexed = contrib.IndexedChoices(flag.String, 'indexed desc', ['a', 'b'], 'a')
+        with mock.patch('logging.getLogger'):
+            flags.level = contrib.LogLevel('foo', 'level desc', 'INFO')
+        tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmpdir)
+        FLAGS.offload_descriptions(os.path.join(tmpdir, 'descriptions.json'))
+        for name in ('choice', 'indexed', 'level'):
+            inner = FLAGS.get('foo', name).inner_value
+            self.assertEqual(inner._description, 'foo.' + name)
+            self.assertEqual(inner.description, '%s desc' % name)
+
+
+class Region(enum.Enum):
+    EAST = 'east'
+    WEST = 'west'
+
+
+class IndexedChoicesTest(unittest.TestCase):
+
+    def test_choices(self):
+        choices = contrib.IndexedChoices(flag.Int, 'pick a number', range(1000), 1)
+        choices.set('999')
+        self.assertEqual(choices.get(), 999)
+        with self.assertRaises(ValueError):
+            choices.set('1000')
+        with self.assertRaises(flag.FlagException):
+            contrib.IndexedChoices(flag.Int, 'pick a number', range(3), 4)
+
+    def test_enum(self):
+        choices = contrib.IndexedChoices(flag.String, 'region', Region, Region.EAST)
+        self.assertEqual(choices.get(), Region.EAST)
+        choices.set('west')
+        self.assertEqual(choices.get(), Region.WEST)
+        with self.assertRaises(ValueError):
+            choices.set('WEST')
+        choices = contrib.IndexedChoices(flag.String, 'region', Region, 'west')
+        self.assertIs(choices.default, Region.WEST)
+        self.assertIs(choices.get(), Region.WEST)
+
+    def test_long_description(self):
+        flagset = flag.GlobalFlagSet()
+        flags = flagset.namespace('test')
+        flags.choices = contrib.IndexedChoices(flag.String, 'pick one', 'abcde', 'a')
+        flagset.get('test', 'choices').help_choices = 3
+        out = six.StringIO()
+        flagset.write_flags(out, 'test')
+        self.assertEqual(out.getvalue(), (
+            '    [test.]choices=a: pick one (String)\n' +
+            '        a\n' +
+            '        b\n' +
+            '        c\n' +
+            '        ... and 2 more\n'))
+
+
+class BoolGroupTest(unittest.TestCase):
+
+    def setUp(self):
+        self.FLAGS = flag.GlobalFlagSet()
+        self.flags = self.FLAGS.namespace('features')
+        self.group = contrib.BoolGroup(self.flags)
+        self.new_ui = self.group.declare('new_ui', 'some bool')
+        self.fast_path = self.group.declare('fast_path', 'some bool', default=True)
+        self.beta = self.group.declare('beta', 'some bool')
+
+    def test_clone(self):
+        clone = self.FLAGS.clone()
+        self.assertRaises(flag.FlagException, clone.parse_commandline, ['--new_ui'])
+        self.assertFalse(self.flags.new_ui)
+        self.assertFalse(clone.namespace('features').new_ui)
+
+    def test_update_isolated(self):
+        FLAGS, flag.GLOBAL_FLAGS = flag.GLOBAL_FLAGS, self.FLAGS
+        try:
+            with flag.isolate():
+                with self.assertRaises(flag.FlagException):
+                    self.group.update(fast_path=False, new_ui=True)
+        finally:
+            flag.GLOBAL_FLAGS = FLAGS
+        self.assertEqual((self.group.bits, self.group.set_bits), (2, 0))
+        self.group.update(new_ui=True)
+        self.assertTrue(self.flags.new_ui)
+
+    def test_read(self):
+        self.assertEqual((self.new_ui, self.fast_path, self.beta), (1, 2, 4))
+        self.assertFalse(self.flags.new_ui)
+        self.assertTrue(self.flags.fast_path)
+        self.assertTrue(self.group.enabled('fast_path'))
+        self.assertFalse(self.group.all_enabled(self.group.mask('new_ui', 'fast_path')))
+        self.assertTrue(self.group.any_enabled(self.new_ui | self.fast_path))
+        self.assertEqual(self.group.fingerprint(), '2')
+
+    def test_parse(self):
+        self.FLAGS.parse_commandline(['--new_ui', '--features.fast_path=false'])
+        self.assertTrue(self.flags.new_ui)
+        self.assertFalse(self.flags.fast_path)
+        self.assertTrue(self.FLAGS.get('features', 'new_ui').is_set())
+        self.assertFalse(self.FLAGS.get('features', 'beta').is_set())
+        self.assertEqual(self.group.fingerprint(), '1')
+        self.flags.fast_path = flag.UNSET
+        self.assertTrue(self.flags.fast_path)
+        self.assertFalse(self.FLAGS.get('features', 'fast_path').is_set())
+
+    def test_update(self):
+        self.group.update(new_ui=True, beta=True, fast_path=False)
+        self.assertTrue(self.group.all_enabled(self.new_ui | self.beta))
+        self.assertEqual(self.group.fingerprint(), '5')
+        self.group.update(beta=flag.UNSET, fast_path=flag.UNSET)
+        self.assertEqual(self.group.fingerprint(), '3')
+        with self.assertRaises(KeyError):
+            self.group.update(nope=True)
+        self.FLAGS.freeze()
+        with self.assertRaises(flag.FlagException):
+            self.group.update(beta=True)
+
+    def test_secure_environment(self):
+        self.FLAGS.parse_environment([
+            ('SECURED_SETTING_new_ui', base64.b64encode(b'false').decode('ascii')),
+            ('SECURED_SETTING_beta', base64.b64encode(b'true').decode('ascii'))])
+        self.assertFalse(self.flags.new_ui)
+        self.assertFalse(self.group.enabled('new_ui'))
+        self.assertTrue(self.group.enabled('beta'))
+        self.assertTrue(self.FLAGS.get('features', 'new_ui').secure)
+        report = self.FLAGS.validate(environ=[('SECURED_SETTING_new_ui', 'bm9wZQ==')])
+        self.assertEqual([error.kind for error in report.errors], ['malformed'])
+
+    def test_coerce_value(self):
+        self.assertIs(self.FLAGS.get('features', 'new_ui').coerce_value('true'), True)
+        self.assertFalse(self.flags.new_ui)
+        self.assertEqual(self.group.fingerprint(), '2')
+
+    def test_values_roundtrip(self):
+        self.group.update(beta=True, fast_path=False)
+        FLAGS = flag.GlobalFlagSet()
+        FLAGS.load_values(self.FLAGS.dump_values())
+        group = contrib.BoolGroup(FLAGS.namespace('features'))
+        for name in ('new_ui', 'fast_path', 'beta'):
+            group.declare(name, 'some bool', default=name == 'fast_path')
+        self.assertEqual(group.fingerprint(), '4')
+
+    def test_declare(self):
+        with self.assertRaises(flag.FlagException):
+            self.group.declare('new_ui', 'some bool')
+        with self.assertRaises(flag.FlagException):
+            self.group.declare('other', 'some bool', default=flag.REQUIRED)
+        self.assertEqual(self.group.declare('other', 'some bool'), 8)
+
 
 class JsonTest(unittest.TestCase):
 
@@ -95,6 +358,60 @@ class JsonTest(unittest.TestCase):
             json_flag.set('huh')
 
 
+class RulesTest(unittest.TestCase):
+
+    RULES = [
+        {'when': {'plan': 'free'}, 'value': 10},
+        {'when': {'region': ['eu', 'uk'], 'plan': 'pro'}, 'value': 100},
+        {'when': {'region': 'eu'}, 'value': 50},
+        {'value': 1000},
+    ]
+
+    def test_evaluate(self):
+        rules = contrib.Rules('rate limit')
+        self.assertIsNone(rules.evaluate(plan='free'))
+        rules.set(json.dumps(self.RULES))
+        self.assertEqual(rules.evaluate(plan='free', region='eu'), 10)
+        self.assertEqual(rules.evaluate({'plan': 'pro'}, region='uk'), 100)
+        self.assertEqual(rules.evaluate(plan='team', region='eu'), 50)
+        self.assertEqual(rules.evaluate(region='us'), 1000)
+        self.assertEqual(rules.evaluate(), 1000)
+
+    def test_no_match(self):
+        rules = contrib.RuleSet([{'when': {'tenant': 'acme'}, 'value': True}])
+        self.assertTrue(rules.evaluate(tenant='acme'))
+        self.assertIsNone(rules.evaluate(tenant='other'))
+
+    def test_missing_attribute(self):
+        rules = contrib.RuleSet([{'when': {'tenant': None}, 'value': 1}, {'value': 2}])
+        self.assertEqual(rules.evaluate(tenant=None), 1)
+        self.assertEqual(rules.evaluate(), 2)
+
+    def test_cache_bounded(self):
+        rules = contrib.RuleSet(self.RULES, cache_size=2)
+        for region in ('eu', 'uk', 'us'):
+            rules.evaluate(plan='pro', region=region)
+        self.assertEqual(list(rules._cache), [('pro', 'uk'), ('pro', 'us')])
+        self.assertEqual(rules.evaluate(plan='pro', region='uk'), 100)
+        self.assertEqual(list(rules._cache), [('pro', 'us'), ('pro', 'uk')])
+
+    def test_default_and_pickle(self):
+        rules = contrib.Rules('rate limit', json.dumps(self.RULES))
+        self.assertFalse(rules.is_set())
+        self.assertEqual(rules.evaluate(plan='free'), 10)
+        copied = pickle.loads(pickle.dumps(rules.get()))
+        self.assertEqual(copied, rules.get())
+        self.assertEqual(copied.evaluate(region='eu'), 50)
+
+    def test_invalid(self):
+        rules = contrib.Rules('rate limit')
+        for value in ('{}', '[{"when": {}}]', '[{"when": [], "value": 1}]', 'huh',
+                      '[{"when": {"plan": {"a": 1}}, "value": 1}]',
+                      '[{"when": {"plan": [["a"]]}, "value": 1}]'):
+            with self.assertRaises(ValueError):
+                rules.set(value)
+
+
 class LogLevelTest(unittest.TestCase):
 
     def test_default(self):
@@ -115,7 +432,41 @@ class LogLevelTest(unittest.TestCase):
         mock_get_logger.return_value.setLevel.assert_called_once_with(logging.CRITICAL)
         self.assertEqual(level_flag.get(), logging.CRITICAL)
 
+    def test_long_description(self):
+        level_flag = contrib.LogLevel('foo', 'foo level')
+        self.assertNotIn('long_description', vars(level_flag))
+        self.assertIn('CRITICAL', level_flag.long_description.splitlines())
+
+    def test_coerce_value(self):
+        level_flag = contrib.LogLevel('foo', 'foo level')
+        with mock.patch('logging.getLogger') as mock_get_logger:
+            self.assertEqual(level_flag.coerce_value('debug'), logging.DEBUG)
+        mock_get_logger.assert_not_called()
+        self.assertFalse(level_flag.is_set())
+
+    def test_secure_environment(self):
+        FLAGS = flag.GlobalFlagSet()
+        FLAGS.namespace('foo').level = contrib.LogLevel('foo', 'foo level')
+        with mock.patch('logging.getLogger') as mock_get_logger:
+            FLAGS.parse_environment([
+                ('SECURED_SETTING_level', base64.b64encode(b'debug').decode('ascii'))])
+        mock_get_logger.return_value.setLevel.assert_called_once_with(logging.DEBUG)
+        self.assertTrue(FLAGS.get('foo', 'level').secure)
+
     def test_invalid(self):
         level_flag = contrib.LogLevel('foo', 'foo level')
         with self.assertRaises(ValueError):
             level_flag.set('garbage')
+
+    def test_batched(self):
+        logger = logging.getLogger('oscar.flag.contrib_test.batched')
+        logger.setLevel(logging.NOTSET)
+        with mock.patch.object(logging.Logger.manager, '_clear_cache') as clear_cache:
+            with contrib.batched_log_levels():
+                level_flag = contrib.LogLevel(logger.name, 'foo level', default='INFO')
+                with contrib.batched_log_levels():
+                    level_flag.set('debug')
+                level_flag.set('error')
+                self.assertEqual(logger.level, logging.NOTSET)
+            self.assertEqual(logger.level, logging.ERROR)
+            clear_cache.assert_called_once_with()
@@ -0,0 +1,97 @@
+import os
+import pickle
+import shutil
+import socket
+import tempfile
+import threading
+import unittest
+
+from oscar import flag
+from oscar.flag import daemon
+
+
+UNPICKLED = []
+
+
+class _Payload(object):
+
+    def __reduce__(self):
+        return (UNPICKLED.append, (True,))
+
+
+def _declare(globalflags):
+    foo_flags = globalflags.namespace('foo')
+    foo_flags.bar = flag.Int('some int', 1)
+    foo_flags.baz = flag.String('some string')
+    globalflags.namespace('other').qux = flag.Float('some float')
+    return foo_flags
+
+
+class DaemonTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmpdir)
+        self.path = os.path.join(self.tmpdir, 'flags.sock')
+        self.server_flags = flag.GlobalFlagSet()
+        self.server_foo = _declare(self.server_flags)
+        self.server_flags.parse_commandline(['--bar=2', '--baz=x', '--qux=0.5'])
+        self.server = daemon.serve_in_background(self.path, self.server_flags)
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        self.client_flags = flag.GlobalFlagSet()
+
+    def test_fetch(self):
+        self.assertEqual(os.stat(self.path).st_mode & 0o777, 0o600)
+        foo_flags = _declare(self.client_flags)
+        daemon.FlagClient(self.path, self.client_flags).fetch(['foo'])
+        self.assertEqual((foo_flags.bar, foo_flags.baz), (2, 'x'))
+        self.assertIsNone(self.client_flags.namespace('other').qux)
+
+    def test_subscribe(self):
+        changed = threading.Event()
+        self.client_flags.add_listener(lambda *_: changed.set())
+        client = daemon.FlagClient(self.path, self.client_flags)
+        self.addCleanup(client.close)
+        client.subscribe()
+        # Declared after populating, values were held until now.
+        foo_flags = _declare(self.client_flags)
+        self.assertEqual((foo_flags.bar, foo_flags.baz), (2, 'x'))
+        self.assertEqual(self.client_flags.namespace('other').qux, 0.5)
+
+        changed.clear()
+        self.server_foo.bar = '3'
+        self.assertTrue(changed.wait(5))
+        self.assertEqual(foo_flags.bar, 3)
+
+        changed.clear()
+        self.server_foo.baz = flag.UNSET
+        self.assertTrue(changed.wait(5))
+        self.assertFalse(self.client_flags.get('foo', 'baz').is_set())
+
+    def test_subscribe_namespaces(self):
+        foo_flags = _declare(self.client_flags)
+        changed = threading.Event()
+        self.client_flags.add_listener(lambda *_: changed.set())
+        client = daemon.FlagClient(self.path, self.client_flags)
+        self.addCleanup(client.close)
+        client.subscribe(['other'])
+        self.assertEqual(foo_flags.bar, 1)
+        changed.clear()
+        self.server_flags.parse_commandline(['--bar=4', '--qux=1.5'])
+        self.assertTrue(changed.wait(5))
+        self.assertEqual(self.client_flags.namespace('other').qux, 1.5)
+        self.assertEqual(foo_flags.bar, 1)
+
+    def test_pickled_request(self):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.addCleanup(sock.close)
+        sock.connect(self.path)
+        data = pickle.dumps(('fetch', _Payload()))
+        sock.sendall(daemon._LENGTH.pack(len(data)) + data)
+        self.assertEqual(daemon._recv(sock), ('error', 'malformed request'))
+        self.assertEqual(UNPICKLED, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
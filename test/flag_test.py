@@ -1,11 +1,21 @@
 # pylint: disable=C0103
 import base64
+import json
+import operator
+import os
+import shutil
+import tempfile
+import threading
 import unittest
 
 import six
 
 from oscar import flag
 
+# pylint: disable=wrong-import-position,ungrouped-imports
+six.add_move(six.MovedModule('mock', 'mock', 'unittest.mock'))
+from six.moves import mock
+
 
 class CommandLineTest(unittest.TestCase):
 
@@ -26,6 +36,23 @@ class CommandLineTest(unittest.TestCase):
         self.FLAGS.parse_commandline(args)
         self.assertEqual(self.FLAGS.check_required(), [('bar', 'foo', foo)])
 
+    def test_required_index(self):
+        flags = self.FLAGS.namespace('foo')
+        flags.zed = flag.String("some flag", flag.REQUIRED)
+        flags.abc = flag.Int("some int", flag.REQUIRED)
+        flags.optional = flag.Int("some int")
+        zed, abc = self.FLAGS.get('foo', 'zed'), self.FLAGS.get('foo', 'abc')
+        self.assertEqual(self.FLAGS.check_required(), [('foo', 'abc', abc), ('foo', 'zed', zed)])
+        self.assertEqual(sorted(self.FLAGS.check_required(sort=False)),
+                         sorted([('foo', 'abc', abc), ('foo', 'zed', zed)]))
+        self.FLAGS.parse_commandline(['--abc=1'])
+        self.assertEqual(self.FLAGS.check_required(), [('foo', 'zed', zed)])
+        flags.abc = flag.UNSET
+        flags.zed = 'set'
+        self.assertEqual(self.FLAGS.check_required(), [('foo', 'abc', abc)])
+        abc.set('2')
+        self.assertEqual(self.FLAGS.check_required(), [])
+
     def test_non_existent(self):
         args = ['--noflag', 'foo']
         self.assertRaises(KeyError, self.FLAGS.parse_commandline, args)
@@ -107,7 +134,7 @@ class EnvironmentTest(unittest.TestCase):
         SECRET_BYTES = b'secret_sauce'
         args = [
             ('foo', 'bar'), ('doesnotexist', 'baz'), ('foo.bar', 'blah'),
-            ('SECURED_SETTING_SECRET', base64.encodestring(SECRET_BYTES))]
+            ('SECURED_SETTING_SECRET', base64.b64encode(SECRET_BYTES))]
         flags = self.FLAGS.namespace(__name__)
         foo_flags = self.FLAGS.namespace('foo')
         flags.foo = flag.String("foo string")
@@ -119,6 +146,57 @@ class EnvironmentTest(unittest.TestCase):
         self.assertEqual(flags.SECRET, SECRET_BYTES)
         self.assertEqual(self.FLAGS.get(__name__, 'SECRET').secure, True)
 
+    def test_secure_lazy(self):
+        flags = self.FLAGS.namespace(__name__)
+        flags.SECRET = flag.Int("secret int")
+        self.FLAGS.parse_environment([('SECURED_SETTING_SECRET', base64.b64encode(b'42'))])
+        secret = self.FLAGS.get(__name__, 'SECRET')
+        self.assertIsInstance(secret.value, flag.SecureValue)
+        self.assertNotIn('42', repr(secret))
+        self.assertNotIn('42', repr(secret.value))
+        self.assertEqual(flags.SECRET, 42)
+        secret.value.zero()
+        self.assertEqual(flags.SECRET, 42)
+
+    def test_secure_types(self):
+        flags = self.FLAGS.namespace(__name__)
+        flags.enabled = flag.Bool('some bool')
+        flags.ports = flag.List(flag.Int, ',', 'some ints')
+        self.FLAGS.parse_environment([
+            ('SECURED_SETTING_enabled', base64.b64encode(b'true')),
+            ('SECURED_SETTING_ports', base64.b64encode(b'80,443'))])
+        self.assertIs(flags.enabled, True)
+        self.assertEqual(flags.ports, [80, 443])
+        ports = self.FLAGS.get(__name__, 'ports')
+        # Reads coerce with a copy of the inner flag, not the shared one.
+        self.assertFalse(ports.inner_value.is_set())
+
+    def test_secure_malformed(self):
+        flags = self.FLAGS.namespace(__name__)
+        flags.enabled = flag.Bool('some bool')
+        with self.assertRaises(ValueError) as context:
+            self.FLAGS.parse_environment([('SECURED_SETTING_enabled', base64.b64encode(b'maybe'))])
+        self.assertNotIn('maybe', str(context.exception))
+        self.assertFalse(self.FLAGS.get(__name__, 'enabled').is_set())
+        report = self.FLAGS.validate(environ=[
+            ('SECURED_SETTING_enabled', base64.b64encode(b'true').decode('ascii'))])
+        self.assertTrue(report.ok)
+
+    def test_secure_cache_bounded(self):
+        values = [flag.SecureValue(base64.b64encode(six.b(str(i)))) for i in range(3)]
+        var = flag.Int('some int')
+        with mock.patch.object(flag.SecureValue, 'cache_size', 2):
+            self.assertEqual([value.get(var) for value in values], [0, 1, 2])
+            # The least recently read value was zeroed.
+            self.assertIsNone(values[0]._buffer)
+            buffer = values[2]._buffer
+            self.assertEqual(buffer, bytearray(b'2'))
+            self.assertEqual(values[2].get(var), 2)
+            flag.SecureValue.zero_all()
+            self.assertIsNone(values[2]._buffer)
+            self.assertEqual(buffer, bytearray(1))
+            self.assertEqual(values[2].get(var), 2)
+
 
 class IniTest(unittest.TestCase):
 
@@ -152,6 +230,621 @@ blah = blah
         self.assertRaises(KeyError, self.FLAGS.parse_ini, fp)
 
 
+class ValidateTest(unittest.TestCase):
+
+    def setUp(self):
+        self.FLAGS = flag.GlobalFlagSet()
+        self.foo_flags = self.FLAGS.namespace('foo')
+        self.foo_flags.num = flag.Int('some int')
+        self.foo_flags.dup = flag.Int('some int')
+        self.foo_flags.required = flag.String('some string', flag.REQUIRED)
+        self.foo_flags.ok = flag.String('some string')
+        self.FLAGS.namespace('bar').dup = flag.Int('some int')
+
+    def test_all_errors(self):
+        ini = six.StringIO('''
+[foo]
+num = x
+ok = from ini
+[nope]
+baz = 1
+''')
+        report = self.FLAGS.validate(
+            ['--nope', 'value', '--dup=1', '---bad', '--num=1.5', '--foo.ok=cli', 'arg'],
+            [('num', 'y'), ('dup', '2'), ('PATH', '/bin')],
+            ini)
+        self.assertFalse(report.ok)
+        self.assertEqual([(error.kind, error.source, error.name) for error in report.errors], [
+            ('malformed', 'environment', 'num'),
+            ('ambiguous', 'environment', 'dup'),
+            ('malformed', 'ini', 'foo.num'),
+            ('unknown', 'ini', 'nope.baz'),
+            ('unknown', 'commandline', 'nope'),
+            ('ambiguous', 'commandline', 'dup'),
+            ('malformed', 'commandline', '---bad'),
+            ('malformed', 'commandline', 'num'),
+            ('missing', 'required', 'foo.required'),
+        ])
+        self.assertEqual(self.foo_flags.ok, 'cli')
+        self.assertEqual(self.FLAGS.args, ['arg'])
+        self.assertEqual(len(report.format_text().splitlines()), 9)
+        self.assertEqual(len(json.loads(report.to_json())['errors']), 9)
+
+    def test_secure(self):
+        self.foo_flags.secret = flag.Int('some int')
+        report = self.FLAGS.validate(environ=[
+            ('SECURED_SETTING_num', base64.b64encode(b'abc').decode('ascii')),
+            ('SECURED_SETTING_secret', base64.b64encode(b'42').decode('ascii')),
+            ('SECURED_SETTING_ok', 'not base64!')])
+        self.assertEqual([(error.kind, error.source, error.name) for error in report.errors], [
+            ('malformed', 'environment', 'num'),
+            ('malformed', 'environment', 'ok'),
+            ('missing', 'required', 'foo.required'),
+        ])
+        self.assertNotIn('abc', report.format_text())
+        self.assertFalse(self.FLAGS.get('foo', 'num').is_set())
+        secret = self.FLAGS.get('foo', 'secret')
+        self.assertIsNone(secret.value._buffer)
+        self.assertEqual(self.foo_flags.secret, 42)
+
+    def test_ok(self):
+        report = self.FLAGS.validate(['--foo.required', 'yes'])
+        self.assertTrue(report.ok)
+        self.assertEqual(report.format_text(), '')
+        self.assertEqual(json.loads(report.to_json()), {'ok': True, 'errors': []})
+
+
+class SnapshotTest(unittest.TestCase):
+
+    def setUp(self):
+        self.FLAGS = flag.GlobalFlagSet()
+        self.flags = self.FLAGS.namespace('foo')
+        self.flags.bar = flag.List(flag.Int, ',', 'list of ints')
+        self.flags.baz = flag.String('some string')
+        self.flags.secret = flag.String('secret string', secure=True)
+        self.flags.unset = flag.Float('some float', 1.5)
+
+    def _new_flags(self):
+        other = flag.GlobalFlagSet()
+        flags = other.namespace('foo')
+        flags.bar = flag.List(flag.Int, ',', 'list of ints')
+        flags.baz = flag.String('some string')
+        flags.secret = flag.String('secret string')
+        flags.unset = flag.Float('some float', 1.5)
+        return other, flags
+
+    def test_round_trip(self):
+        self.flags.bar = '1,2,3'
+        self.flags.baz = 'hello'
+        self.flags.secret = 'sauce'
+        out = six.BytesIO()
+        self.FLAGS.export_snapshot(out)
+        self.assertNotIn(b'sauce', out.getvalue())
+
+        other, flags = self._new_flags()
+        other.import_snapshot(six.BytesIO(out.getvalue()))
+        self.assertEqual(flags.bar, [1, 2, 3])
+        self.assertEqual(flags.baz, 'hello')
+        self.assertEqual(flags.secret, 'sauce')
+        self.assertTrue(other.get('foo', 'secret').secure)
+        self.assertFalse(other.get('foo', 'unset').is_set())
+
+    def test_fingerprint_mismatch(self):
+        out = six.BytesIO()
+        self.FLAGS.export_snapshot(out)
+        other, flags = self._new_flags()
+        flags.extra = flag.Int('another int')
+        self.assertNotEqual(self.FLAGS.fingerprint(), other.fingerprint())
+        self.assertRaises(flag.FlagException, other.import_snapshot,
+                          six.BytesIO(out.getvalue()))
+
+    def test_not_a_snapshot(self):
+        self.assertRaises(flag.ParseException, self.FLAGS.import_snapshot,
+                          six.BytesIO(b'[foo]\nbar=1\n'))
+
+
+class LookupTest(unittest.TestCase):
+
+    def setUp(self):
+        self.FLAGS = flag.GlobalFlagSet()
+        self.FLAGS.namespace('company.service').foo = flag.Int('some int')
+        self.FLAGS.namespace('company.service.module').bar = flag.Int('some int')
+        self.FLAGS.namespace('company.services').baz = flag.Int('some int')
+        self.FLAGS.namespace('company').service = flag.Int('some int')
+
+    def test_find_prefix(self):
+        expected = [
+            ('company.service', 'foo', self.FLAGS.get('company.service', 'foo')),
+            ('company.service.module', 'bar',
+             self.FLAGS.get('company.service.module', 'bar')),
+        ]
+        self.assertEqual(self.FLAGS.find_prefix('company.service'), expected)
+        self.assertEqual(self.FLAGS.find_prefix('company.service.*'), expected)
+        self.assertEqual(len(self.FLAGS.find_prefix('company')), 4)
+        self.assertEqual(self.FLAGS.find_prefix('other'), [])
+        self.FLAGS.namespace('company.service').qux = flag.Int('some int')
+        self.assertEqual(len(self.FLAGS.find_prefix('company.service')), 3)
+
+    def test_deep_namespaces(self):
+        self.FLAGS.parse_commandline(['--company.service.module.bar=1', '--baz', '2'])
+        self.assertEqual(self.FLAGS.namespace('company.service.module').bar, 1)
+        self.assertEqual(self.FLAGS.namespace('company.services').baz, 2)
+        self.assertEqual(self.FLAGS.find_short('service'), 'company')
+        self.assertRaises(KeyError, self.FLAGS.parse_commandline, ['--company.service.baz=1'])
+
+
+class IterationTest(unittest.TestCase):
+
+    def test_iter_flags(self):
+        FLAGS = flag.GlobalFlagSet()
+        FLAGS.namespace('foo.bar').b = flag.Int('some int')
+        FLAGS.namespace('foo').z = flag.Int('some int')
+        FLAGS.namespace('foo').a = flag.Int('some int')
+        FLAGS.namespace('foo').z = '1'
+        self.assertEqual([entry[:2] for entry in FLAGS.iter_flags()], [
+            ('foo', 'a'), ('foo', 'z'), ('foo.bar', 'b')])
+        self.assertEqual([entry[:2] for entry in FLAGS.iter_set_flags()], [('foo', 'z')])
+        FLAGS.namespace('bar').c = flag.Int('some int')
+        visited = []
+        FLAGS.visit_all(lambda namespace, name, _: visited.append((namespace, name)))
+        self.assertEqual(visited, [('bar', 'c'), ('foo', 'a'), ('foo', 'z'), ('foo.bar', 'b')])
+        visited = []
+        FLAGS.visit(lambda namespace, name, _: visited.append((namespace, name)))
+        self.assertEqual(visited, [('foo', 'z')])
+
+
+class ConcurrentDeclarationTest(unittest.TestCase):
+
+    THREADS = 16
+    FLAGS_PER_THREAD = 100
+
+    def _run(self, target):
+        start = threading.Event()
+        errors = []
+
+        def _worker(i):
+            start.wait()
+            try:
+                target(i)
+            except Exception as exc:  # pylint: disable=broad-except
+                errors.append(exc)
+        threads = [threading.Thread(target=_worker, args=(i,)) for i in range(self.THREADS)]
+        for thread in threads:
+            thread.start()
+        start.set()
+        for thread in threads:
+            thread.join()
+        return errors
+
+    def test_declare(self):
+        FLAGS = flag.GlobalFlagSet()
+
+        def _declare(i):
+            for j in range(self.FLAGS_PER_THREAD):
+                flags = FLAGS.namespace('ns%d' % (j % 4))
+                setattr(flags, 'flag_%d_%d' % (i, j), flag.Int('some int', j))
+                self.assertEqual(getattr(flags, 'flag_%d_%d' % (i, j)), j)
+                list(FLAGS.iter_flags())
+        self.assertEqual(self._run(_declare), [])
+        self.assertEqual(sorted(FLAGS.namespace_flags), ['ns0', 'ns1', 'ns2', 'ns3'])
+        expected = self.THREADS * self.FLAGS_PER_THREAD
+        self.assertEqual(sum(len(flags._flags) for flags in FLAGS.namespace_flags.values()),
+                         expected)
+        self.assertEqual(len(list(FLAGS.iter_flags())), expected)
+        self.assertEqual(len(FLAGS.find_prefix('ns1')), expected // 4)
+        self.assertEqual(FLAGS.find_short('flag_3_5'), 'ns1')
+
+    def test_declare_same_flag(self):
+        FLAGS = flag.GlobalFlagSet()
+        errors = self._run(lambda i: setattr(FLAGS.namespace('foo'), 'bar',
+                                             flag.Int('some int', i)))
+        self.assertEqual(len(errors), self.THREADS - 1)
+        self.assertTrue(all(isinstance(exc, flag.FlagException) for exc in errors))
+        self.assertEqual(FLAGS.find_short('bar'), 'foo')
+
+    def test_pending_values(self):
+        source = flag.GlobalFlagSet()
+        for i in range(self.THREADS):
+            setattr(source.namespace('foo'), 'flag_%d' % i, flag.Int('some int'))
+            setattr(source.namespace('foo'), 'flag_%d' % i, str(i))
+        data = source.dump_values()
+        FLAGS = flag.GlobalFlagSet()
+
+        def _declare_or_load(i):
+            if i == 0:
+                FLAGS.load_values(data)
+            else:
+                setattr(FLAGS.namespace('foo'), 'flag_%d' % i, flag.Int('some int'))
+        self.assertEqual(self._run(_declare_or_load), [])
+        FLAGS.namespace('foo').flag_0 = flag.Int('some int')
+        self.assertEqual([getattr(FLAGS.namespace('foo'), 'flag_%d' % i)
+                          for i in range(self.THREADS)], list(range(self.THREADS)))
+
+
+ISOLATED_FLAGS = flag.namespace('flag_test.isolate')
+ISOLATED_FLAGS.some_int = flag.Int('some int', 1)
+
+
+class CloneTest(unittest.TestCase):
+
+    def setUp(self):
+        self.FLAGS = flag.GlobalFlagSet()
+        self.flags = self.FLAGS.namespace('foo')
+        self.flags.bar = flag.Int('some int', 1)
+        self.flags.baz = flag.String('some string', flag.REQUIRED)
+        self.flags.url = flag.Derived('some url', 'http://${baz}:${bar}')
+        self.FLAGS.parse_commandline(['--bar=2'])
+
+    def test_copy_on_write(self):
+        clone = self.FLAGS.clone()
+        flags = clone.namespace('foo')
+        self.assertIs(clone.get('foo', 'bar'), self.FLAGS.get('foo', 'bar'))
+        self.assertEqual(flags.bar, 2)
+        clone.parse_commandline(['--bar=3', '--baz=host'])
+        self.assertIsNot(clone.get('foo', 'bar'), self.FLAGS.get('foo', 'bar'))
+        self.assertEqual((flags.bar, flags.baz), (3, 'host'))
+        self.assertEqual((self.flags.bar, self.flags.baz), (2, flag.REQUIRED))
+        flags.bar = flag.UNSET
+        self.assertEqual((flags.bar, self.flags.bar), (1, 2))
+        self.assertEqual(clone.check_required(), [])
+        self.assertEqual([entry[:2] for entry in self.FLAGS.check_required()],
+                         [('foo', 'baz')])
+
+    def test_derived(self):
+        self.flags.baz = 'a'
+        self.assertEqual(self.flags.url, 'http://a:2')
+        clone = self.FLAGS.clone()
+        clone.namespace('foo').baz = 'b'
+        self.assertEqual(clone.namespace('foo').url, 'http://b:2')
+        self.assertEqual(self.flags.url, 'http://a:2')
+        self.flags.bar = '5'
+        self.assertEqual(clone.namespace('foo').url, 'http://b:2')
+        self.assertEqual(self.flags.url, 'http://a:5')
+
+    def test_clone_of_clone(self):
+        clone = self.FLAGS.clone()
+        clone.namespace('foo').bar = '3'
+        nested = clone.clone()
+        nested.namespace('foo').bar = '4'
+        nested.namespace('foo').qux = flag.Int('some int')
+        self.assertEqual([flags.namespace('foo').bar for flags in (self.FLAGS, clone, nested)],
+                         [2, 3, 4])
+        self.assertNotIn('qux', clone.namespace('foo')._flags)
+
+    def test_isolate(self):
+        globalflags = flag.GLOBAL_FLAGS
+        with flag.isolate() as clone:
+            self.assertIs(flag.GLOBAL_FLAGS, clone)
+            self.assertIs(flag.namespace('flag_test.isolate'), ISOLATED_FLAGS)
+            flag.parse_commandline(['--flag_test.isolate.some_int=5'])
+            self.assertEqual(ISOLATED_FLAGS.some_int, 5)
+            ISOLATED_FLAGS.other = flag.Int('some int', 2)
+            with flag.override(ISOLATED_FLAGS, some_int=6):
+                self.assertEqual(ISOLATED_FLAGS.some_int, 6)
+        self.assertIs(flag.GLOBAL_FLAGS, globalflags)
+        self.assertEqual(ISOLATED_FLAGS.some_int, 1)
+        self.assertNotIn('other', ISOLATED_FLAGS._flags)
+
+    def test_override_copied(self):
+        with flag.override(self.flags, bar=5):
+            clone = self.FLAGS.clone()
+            clone.namespace('foo').bar = '7'
+            self.assertEqual(clone.namespace('foo').bar, 5)
+            with flag.override(clone.namespace('foo'), bar=6):
+                self.assertEqual(clone.namespace('foo').bar, 6)
+                self.assertEqual(self.flags.bar, 6)
+        self.assertEqual((clone.namespace('foo').bar, self.flags.bar), (7, 2))
+
+    def test_shared_state(self):
+        shared = flag.Int('some int')
+        shared.shared_state = True
+        self.flags.qux = shared
+        clone = self.FLAGS.clone()
+        self.assertRaises(flag.FlagException, setattr, clone.namespace('foo'), 'qux', '1')
+        self.assertRaises(flag.FlagException, clone.parse_commandline, ['--qux=1'])
+        self.assertFalse(shared.is_set())
+        self.flags.qux = '2'
+        self.assertEqual(clone.namespace('foo').qux, 2)
+
+
+class ListenerTest(unittest.TestCase):
+
+    def test_listener(self):
+        FLAGS = flag.GlobalFlagSet()
+        calls = []
+
+        def _listener(namespace, name, _):
+            # Reading the indexes from a listener must not deadlock.
+            calls.append((namespace, name, len(list(FLAGS.iter_flags()))))
+        FLAGS.add_listener(_listener)
+
+        def _declare_and_set():
+            FLAGS.namespace('foo').bar = flag.String('some string', flag.REQUIRED)
+            FLAGS.namespace('foo').baz = flag.Int('some int')
+            FLAGS.namespace('foo').bar = 'x'
+        thread = threading.Thread(target=_declare_and_set)
+        thread.daemon = True
+        thread.start()
+        thread.join(5)
+        self.assertFalse(thread.is_alive())
+        self.assertEqual(calls, [('foo', 'bar', 2)])
+        self.assertEqual(FLAGS.check_required(), [])
+        FLAGS.remove_listener(_listener)
+        FLAGS.namespace('foo').bar = flag.UNSET
+        self.assertEqual(len(calls), 1)
+        self.assertEqual([entry[:2] for entry in FLAGS.check_required()], [('foo', 'bar')])
+
+
+class FreezeTest(unittest.TestCase):
+
+    def setUp(self):
+        self.FLAGS = flag.GlobalFlagSet()
+        self.flags = self.FLAGS.namespace('foo')
+        self.flags.bar = flag.Int('some int', 1)
+        self.flags.baz = flag.String('some string', flag.REQUIRED)
+        self.flags.secret = flag.String('secret string')
+        self.FLAGS.parse_environment([('SECURED_SETTING_secret', base64.b64encode(b'sauce'))])
+        self.flags.bar = '2'
+        self.FLAGS.freeze()
+
+    def test_view(self):
+        view = self.FLAGS.view('foo')
+        self.assertEqual(dict(view), {'bar': 2, 'baz': flag.REQUIRED})
+        self.assertRaises(TypeError, operator.setitem, view, 'bar', 3)
+        self.assertEqual(self.flags.bar, 2)
+        self.assertEqual(self.flags.secret, b'sauce')
+        self.assertRaises(KeyError, self.FLAGS.view, 'nope')
+        self.assertRaises(flag.FlagException, flag.GlobalFlagSet().view, 'foo')
+
+    def test_rejects_changes(self):
+        self.assertRaises(flag.FlagException, setattr, self.flags, 'bar', '3')
+        self.assertRaises(flag.FlagException, setattr, self.flags, 'bar', flag.UNSET)
+        self.assertRaises(flag.FlagException, setattr, self.flags, 'qux', flag.Int('an int'))
+        self.assertRaises(flag.FlagException, self.FLAGS.namespace, 'new')
+        self.assertRaises(flag.FlagException, self.FLAGS.parse_commandline, ['--bar=3'])
+        self.assertRaises(flag.FlagException, self.FLAGS.parse_environment, [('bar', '3')])
+        self.assertRaises(flag.FlagException, self.FLAGS.parse_ini,
+                          six.StringIO('[foo]\nbar = 3\n'))
+        self.assertEqual(self.flags.bar, 2)
+        with flag.override(self.flags, bar=3):
+            self.assertEqual(self.flags.bar, 3)
+
+    def test_cached(self):
+        required = self.FLAGS.check_required()
+        self.assertEqual(required, [('foo', 'baz', self.FLAGS.get('foo', 'baz'))])
+        required.pop()
+        self.assertEqual(len(self.FLAGS.check_required()), 1)
+        out = six.StringIO()
+        self.FLAGS.write_flags(out, 'foo')
+        self.assertIs(self.FLAGS._frozen_cache[('help', 'foo')], out.getvalue())
+        out = six.StringIO()
+        self.FLAGS.write_flags(out)
+        self.assertEqual(out.getvalue(), '')
+
+
+    def test_derived_error(self):
+        FLAGS = flag.GlobalFlagSet()
+        first = FLAGS.namespace('a')
+        first.url = flag.Derived('some url', 'pg://${nope}')
+        first.bar = flag.Int('some int', 1)
+        FLAGS.namespace('b').qux = flag.Derived('some ratio', lambda bar: 1 // (bar - 1),
+                                                depends=['a.bar'])
+        FLAGS.freeze()
+        self.assertTrue(FLAGS.frozen)
+        self.assertEqual(dict(FLAGS.view('a')), {'bar': 1})
+        self.assertEqual(dict(FLAGS.view('b')), {})
+        self.assertRaises(flag.FlagException, getattr, first, 'url')
+        self.assertRaises(ZeroDivisionError, getattr, FLAGS.namespace('b'), 'qux')
+
+    def test_atomic(self):
+        FLAGS = flag.GlobalFlagSet()
+        FLAGS.namespace('a').bar = flag.Int('some int', 1)
+        FLAGS.namespace('b').baz = flag.Int('some int', 2)
+        with mock.patch.object(flag.NamespaceFlagSet, '_frozen_view', autospec=True,
+                               side_effect=[flag.MappingProxyType({}), RuntimeError]):
+            self.assertRaises(RuntimeError, FLAGS.freeze)
+        self.assertFalse(FLAGS.frozen)
+        self.assertTrue(all(flagset._frozen is None
+                            for flagset in FLAGS.namespace_flags.values()))
+        FLAGS.namespace('a').bar = '3'
+        self.assertEqual(FLAGS.namespace('a').bar, 3)
+
+
+class OffloadDescriptionsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.FLAGS = flag.GlobalFlagSet()
+        self.flags = self.FLAGS.namespace('foo')
+        self.flags.bar = flag.Int('some int', 1)
+        self.flags.baz = flag.List(flag.Int, ',', 'some ints')
+        tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmpdir)
+        self.path = os.path.join(tmpdir, 'descriptions.json')
+
+    def help(self):
+        out = six.StringIO()
+        self.FLAGS.write_flags_long(out)
+        return out.getvalue()
+
+    def test_offload(self):
+        expected = self.help()
+        table = self.FLAGS.offload_descriptions(self.path)
+        var = self.FLAGS.get('foo', 'bar')
+        self.assertEqual(var._description, 'foo.bar')
+        self.assertEqual(var.description, 'some int')
+        self.assertEqual(self.FLAGS.get('foo', 'baz').inner_value.description, 'some ints')
+        with mock.patch.object(table, '_load', wraps=table._load) as load:
+            self.assertEqual(self.help(), expected)
+        self.assertEqual(load.call_count, 1)
+        self.assertIsNone(table._entries)
+
+    def test_declared_later(self):
+        self.FLAGS.offload_descriptions(self.path)
+        self.flags.qux = flag.String('some string')
+        self.assertEqual(self.FLAGS.get('foo', 'qux')._description, 'some string')
+        self.assertIn('some string', self.help())
+        self.FLAGS.offload_descriptions(self.path + '.2')
+        self.assertEqual(self.FLAGS.get('foo', 'qux')._description, 'foo.qux')
+        self.assertEqual(self.FLAGS.get('foo', 'bar').description, 'some int')
+
+    def test_frozen_not_cached(self):
+        self.FLAGS.offload_descriptions(self.path)
+        self.FLAGS.freeze()
+        self.assertIn('some int', self.help())
+        self.assertEqual(self.FLAGS._frozen_cache, {})
+
+
+class LoadValuesTest(unittest.TestCase):
+
+    def test_round_trip(self):
+        FLAGS = flag.GlobalFlagSet()
+        flags = FLAGS.namespace('foo')
+        flags.bar = flag.Int('some int')
+        flags.baz = flag.String('some string', secure=True)
+        flags.unset = flag.String('another string')
+        flags.bar = '42'
+        flags.baz = 'secret'
+
+        other = flag.GlobalFlagSet()
+        other_flags = other.namespace('foo')
+        other_flags.bar = flag.Int('some int')
+        other.load_values(FLAGS.dump_values())
+        self.assertEqual(other_flags.bar, 42)
+        # Undeclared flags are restored on declaration.
+        other_flags.baz = flag.String('some string')
+        other_flags.unset = flag.String('another string')
+        self.assertEqual(other_flags.baz, 'secret')
+        self.assertTrue(other.get('foo', 'baz').secure)
+        self.assertFalse(other.get('foo', 'unset').is_set())
+
+
+class DerivedTest(unittest.TestCase):
+
+    def setUp(self):
+        self.FLAGS = flag.GlobalFlagSet()
+        self.db_flags = self.FLAGS.namespace('db')
+        self.db_flags.host = flag.String('some host', 'localhost')
+        self.db_flags.port = flag.Int('some port', 5432)
+
+    def test_interpolation(self):
+        self.db_flags.url = flag.Derived('some url', 'postgres://${host}:${db.port}/app')
+        self.assertEqual(self.db_flags.url, 'postgres://localhost:5432/app')
+        self.FLAGS.parse_commandline(['--db.port=6543'])
+        self.assertEqual(self.db_flags.url, 'postgres://localhost:6543/app')
+        with self.assertRaises(flag.FlagException):
+            self.FLAGS.parse_commandline(['--db.url=foo'])
+
+    def test_function_memoized(self):
+        calls = []
+
+        def _size(workers, threads):
+            calls.append((workers, threads))
+            return workers * threads
+        main_flags = self.FLAGS.namespace('__main__')
+        main_flags.pool_size = flag.Derived('some size', _size, depends=['workers', 'threads'])
+        main_flags.doubled = flag.Derived('some size', lambda size: size * 2,
+                                          depends=['pool_size'])
+        with self.assertRaises(flag.FlagException):
+            main_flags.doubled
+        main_flags.workers = flag.Int('some int', 2)
+        main_flags.threads = flag.Int('some int', 3)
+        self.assertEqual(main_flags.doubled, 12)
+        self.assertEqual(main_flags.pool_size, 6)
+        self.assertEqual(calls, [(2, 3)])
+        self.db_flags.port = '1'
+        self.assertEqual(main_flags.pool_size, 6)
+        main_flags.threads = '4'
+        self.assertEqual(main_flags.doubled, 16)
+        self.assertEqual(calls, [(2, 3), (2, 4)])
+
+    def test_cycle(self):
+        main_flags = self.FLAGS.namespace('__main__')
+        main_flags.a = flag.Derived('some string', '${b}')
+        main_flags.b = flag.Derived('some string', '${c}')
+        with self.assertRaises(flag.FlagException):
+            main_flags.c = flag.Derived('some string', '${a}')
+        with self.assertRaises(flag.FlagException):
+            main_flags.d = flag.Derived('some string', '${d}')
+        self.assertEqual(sorted(main_flags._flags), ['a', 'b'])
+        main_flags.c = flag.String('some string', 'end')
+        self.assertEqual(main_flags.a, 'end')
+
+    def test_secure(self):
+        self.db_flags.password = flag.String('some secret', 'hunter2', secure=True)
+        self.db_flags.url = flag.Derived('some url', 'pg://u:${password}@${host}')
+        self.db_flags.label = flag.Derived('some url', '${url}!')
+        self.assertTrue(self.db_flags._flags['url'].secure)
+        self.assertTrue(self.db_flags._flags['label'].secure)
+        self.assertIn('<secure>', repr(self.db_flags._flags['url']))
+
+    def test_secure_later(self):
+        self.db_flags.url = flag.Derived('some url', 'pg://${user}@${host}')
+        self.db_flags.label = flag.Derived('some url', '${url}!')
+        self.assertFalse(self.db_flags._flags['url'].secure)
+        self.db_flags.user = flag.String('some user', 'u')
+        self.assertFalse(self.db_flags._flags['url'].secure)
+        self.FLAGS.parse_environment([
+            ('SECURED_SETTING_user', base64.b64encode(b'admin').decode('ascii'))])
+        self.assertTrue(self.db_flags._flags['url'].secure)
+        self.assertTrue(self.db_flags._flags['label'].secure)
+
+        self.db_flags.other = flag.Derived('some url', '${token}')
+        self.db_flags.token = flag.String('some secret', secure=True)
+        self.assertTrue(self.db_flags._flags['other'].secure)
+
+    def test_not_exported(self):
+        self.db_flags.url = flag.Derived('some url', '${host}')
+        self.assertEqual([entry[1] for entry in self.FLAGS.iter_set_flags()], [])
+
+
+class OverrideTest(unittest.TestCase):
+
+    def setUp(self):
+        self.FLAGS = flag.GlobalFlagSet()
+        self.flags = self.FLAGS.namespace('foo')
+        self.flags.bar = flag.Int('some int', 1)
+        self.flags.baz = flag.String('some string')
+
+    def test_override(self):
+        self.flags.baz = 'set'
+        with flag.override(self.flags, bar=2, baz=flag.UNSET):
+            self.assertEqual(self.flags.bar, 2)
+            self.assertEqual(self.flags.baz, None)
+            with flag.override(self.flags, bar=3):
+                self.assertEqual(self.flags.bar, 3)
+                self.assertEqual(self.flags.baz, None)
+            self.assertEqual(self.flags.bar, 2)
+        self.assertEqual(self.flags.bar, 1)
+        self.assertEqual(self.flags.baz, 'set')
+
+    def test_unknown_flag(self):
+        self.assertRaises(KeyError, flag.override, self.flags, nope=1)
+
+    def test_other_threads_unaffected(self):
+        seen = []
+        thread = threading.Thread(target=lambda: seen.append(self.flags.bar))
+        with flag.override(self.flags, bar=2):
+            thread.start()
+            thread.join()
+        self.assertEqual(seen, [1])
+
+    def test_async(self):
+        def _await(awaitable):
+            try:
+                next(awaitable.__await__())
+            except StopIteration as stop:
+                return stop.args[0] if stop.args else None
+
+        ctx = flag.override(self.flags, bar=2)
+        self.assertIs(_await(ctx.__aenter__()), ctx)
+        self.assertEqual(self.flags.bar, 2)
+        _await(ctx.__aexit__(None, None, None))
+        self.assertEqual(self.flags.bar, 1)
+        with mock.patch.object(flag, 'contextvars', None):
+            self.assertRaises(flag.FlagException, ctx.__aenter__)
+        self.assertEqual(self.flags.bar, 1)
+
+
 class FlagTypeTest(unittest.TestCase):
 
     def test_string(self):
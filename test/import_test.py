@@ -0,0 +1,39 @@
+import subprocess
+import sys
+import unittest
+
+HEAVY_MODULES = frozenset([
+    'base64', 'configparser', 'ConfigParser', 'dateutil', 'hashlib', 'json', 'logging',
+    'pickle', 'cPickle'])
+
+
+def _imported_modules(module):
+    '''Returns ``{name: cumulative microseconds}`` for modules imported by ``module``.'''
+    output = subprocess.check_output(
+        [sys.executable, '-X', 'importtime', '-c', 'import %s' % module],
+        stderr=subprocess.STDOUT).decode('utf-8')
+    times = {}
+    for line in output.splitlines():
+        if not line.startswith('import time:') or '|' not in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        if cumulative.strip().isdigit():
+            times[name.strip()] = int(cumulative)
+    return times
+
+
+@unittest.skipIf(sys.version_info < (3, 7), '-X importtime requires Python 3.7')
+class ImportTimeTest(unittest.TestCase):
+
+    def _assert_light(self, module):
+        times = _imported_modules(module)
+        self.assertIn(module, times)
+        heavy = sorted(name for name in times if name.split('.')[0] in HEAVY_MODULES)
+        self.assertEqual(heavy, [], 'import %s took %dus and imported %s' % (
+            module, times[module], heavy))
+
+    def test_flag(self):
+        self._assert_light('oscar.flag')
+
+    def test_contrib(self):
+        self._assert_light('oscar.flag.contrib')
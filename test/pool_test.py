@@ -0,0 +1,101 @@
+import multiprocessing
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import textwrap
+import unittest
+
+try:
+    from concurrent import futures
+except ImportError:  # Python 2 without the futures backport
+    futures = None
+
+from oscar import flag
+from oscar.flag import pool as flag_pool
+
+MAIN_SCRIPT = '''
+import multiprocessing
+import sys
+
+from oscar import flag
+from oscar.flag import pool as flag_pool
+
+FLAGS = flag.namespace(__name__)
+FLAGS.workers = flag.Int('some int', 1)
+
+
+def read_workers(_):
+    return FLAGS.workers
+
+
+if __name__ == '__main__':
+    flag.parse_commandline(sys.argv[1:])
+    workers = multiprocessing.get_context('spawn').Pool(1, **flag_pool.initializer_kwargs())
+    try:
+        print(workers.map(read_workers, [0]))
+    finally:
+        workers.terminate()
+        workers.join()
+'''
+
+FLAGS = flag.namespace('oscar.flag.pool_test')
+FLAGS.workers = flag.Int('some int', 1)
+FLAGS.names = flag.List(flag.String, ',', 'some list')
+
+
+def _read_flags():
+    return FLAGS.workers, FLAGS.names
+
+
+class InitializerTest(unittest.TestCase):
+
+    def setUp(self):
+        FLAGS.workers = '64'
+        FLAGS.names = 'a,b'
+
+    def tearDown(self):
+        FLAGS.workers = flag.UNSET
+        FLAGS.names = flag.UNSET
+
+    @unittest.skipIf(sys.version_info < (3, 7),
+                     'ProcessPoolExecutor initializer requires Python 3.7')
+    def test_process_pool_executor(self):
+        context = multiprocessing.get_context('spawn')
+        executor = futures.ProcessPoolExecutor(
+            1, mp_context=context, **flag_pool.initializer_kwargs())
+        with executor:
+            self.assertEqual(executor.submit(_read_flags).result(), (64, ['a', 'b']))
+
+    @unittest.skipIf(sys.version_info < (3, 4), 'spawn start method requires Python 3.4')
+    def test_multiprocessing_pool(self):
+        context = multiprocessing.get_context('spawn')
+        workers = context.Pool(1, **flag_pool.initializer_kwargs())
+        try:
+            self.assertEqual(workers.apply(_read_flags), (64, ['a', 'b']))
+        finally:
+            workers.terminate()
+            workers.join()
+
+    def test_chained_initializer(self):
+        calls = []
+        kwargs = flag_pool.initializer_kwargs(calls.append, ('called',))
+        FLAGS.workers = '1'
+        kwargs['initializer'](*kwargs['initargs'])
+        self.assertEqual(calls, ['called'])
+        self.assertEqual(FLAGS.workers, 64)
+
+    @unittest.skipIf(sys.version_info < (3, 4), 'spawn start method requires Python 3.4')
+    def test_main_script(self):
+        tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmpdir)
+        script = os.path.join(tmpdir, 'main_script.py')
+        with open(script, 'w') as script_file:
+            script_file.write(textwrap.dedent(MAIN_SCRIPT))
+        env = dict(os.environ)
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        env['PYTHONPATH'] = os.pathsep.join(filter(None, [root, env.get('PYTHONPATH')]))
+        output = subprocess.check_output(
+            [sys.executable, script, '--workers=64'], env=env).decode('utf-8')
+        self.assertEqual(output.strip(), '[64]')
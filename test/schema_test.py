@@ -0,0 +1,97 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+import six
+
+from oscar import flag
+from oscar.flag import contrib
+from oscar.flag import schema
+
+# pylint: disable=wrong-import-position,ungrouped-imports
+six.add_move(six.MovedModule('mock', 'mock', 'unittest.mock'))
+from six.moves import mock
+
+
+class SchemaTest(unittest.TestCase):
+
+    def setUp(self):
+        self.FLAGS = flag.GlobalFlagSet()
+        flags = self.FLAGS.namespace('foo')
+        flags.num = flag.Int('some int', 1)
+        flags.ratio = flag.Float('some float', flag.REQUIRED)
+        flags.names = flag.List(flag.String, ',', 'some list')
+        flags.verbose = flag.Bool('some bool', False)
+        flags.color = contrib.Choices(flag.String, 'some choice', ['red', 'blue'], 'red')
+        flags.workers = contrib.BoundedInt('some int', minimum=1, maximum=8)
+        flags.timeout = contrib.Duration('some duration', '1s')
+        flags.secret = flag.String('some secret', 'hunter2', secure=True)
+
+    def test_offloaded_descriptions(self):
+        expected = schema.export_schema(self.FLAGS)
+        schema._CACHE.pop(self.FLAGS)
+        tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmpdir)
+        table = self.FLAGS.offload_descriptions(os.path.join(tmpdir, 'descriptions.json'))
+        with mock.patch.object(table, '_load', wraps=table._load) as load:
+            self.assertEqual(schema.export_schema(self.FLAGS), expected)
+        self.assertEqual(load.call_count, 1)
+
+    def test_export(self):
+        exported = schema.export_schema(self.FLAGS)
+        json.dumps(exported)
+        foo = exported['properties']['foo']
+        self.assertEqual(foo['required'], ['ratio'])
+        self.assertFalse(foo['additionalProperties'])
+        properties = foo['properties']
+        self.assertEqual(properties['num'], {
+            'type': 'integer', 'default': 1, 'description': 'some int', 'x-flag-type': 'Int'})
+        self.assertEqual(properties['names']['type'], 'array')
+        self.assertEqual(properties['names']['items']['type'], 'string')
+        self.assertEqual(properties['names']['x-separator'], ',')
+        self.assertEqual(properties['color']['enum'], ['blue', 'red'])
+        self.assertEqual((properties['workers']['minimum'], properties['workers']['maximum']),
+                         (1, 8))
+        self.assertEqual(properties['timeout']['default'], 1.0)
+        self.assertNotIn('type', properties['timeout'])
+        self.assertNotIn('default', properties['secret'])
+        self.assertTrue(properties['secret']['writeOnly'])
+
+    def test_cached_per_namespace(self):
+        first = schema.export_schema(self.FLAGS)
+        self.FLAGS.namespace('bar').baz = flag.Int('some int')
+        second = schema.export_schema(self.FLAGS)
+        self.assertIs(first['properties']['foo'], second['properties']['foo'])
+        self.assertIn('bar', second['properties'])
+        self.FLAGS.namespace('foo').extra = flag.Int('some int')
+        third = schema.export_schema(self.FLAGS)
+        self.assertIsNot(first['properties']['foo'], third['properties']['foo'])
+        self.assertIn('extra', third['properties']['foo']['properties'])
+
+    def test_check_ini(self):
+        exported = json.loads(json.dumps(schema.export_schema(self.FLAGS)))
+        report = schema.check_ini(exported, six.StringIO('''
+[foo]
+num = 1.5
+names = a,b
+verbose = maybe
+color = green
+workers = 9
+timeout = 250ms
+nope = 1
+[bar]
+baz = 1
+'''), check_required=True)
+        self.assertEqual([(error.kind, error.name) for error in report.errors], [
+            ('malformed', 'foo.num'),
+            ('malformed', 'foo.verbose'),
+            ('malformed', 'foo.color'),
+            ('malformed', 'foo.workers'),
+            ('unknown', 'foo.nope'),
+            ('unknown', 'bar'),
+            ('missing', 'foo.ratio'),
+        ])
+        report = schema.check_ini(exported, six.StringIO('[foo]\nratio = 0.5\n'), True)
+        self.assertTrue(report.ok)
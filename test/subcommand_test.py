@@ -0,0 +1,100 @@
+import os
+import shutil
+import sys
+import tempfile
+import textwrap
+import unittest
+
+import six
+
+from oscar import flag
+from oscar.flag import subcommand
+
+DEPLOY_MODULE = '''
+from oscar import flag
+
+FLAGS = flag.namespace(__name__)
+FLAGS.release = flag.String('release to deploy', flag.REQUIRED)
+FLAGS.verbose = flag.Bool('deploy verbosely')
+'''
+
+MIGRATE_MODULE = '''
+from oscar import flag
+
+FLAGS = flag.namespace(__name__)
+FLAGS.steps = flag.Int('migrations to run', 1)
+'''
+
+
+class SubcommandsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        for name, source in (('subcommand_test_deploy', DEPLOY_MODULE),
+                             ('subcommand_test_migrate', MIGRATE_MODULE)):
+            with open(os.path.join(self.tmpdir, name + '.py'), 'w') as module:
+                module.write(textwrap.dedent(source))
+        sys.path.insert(0, self.tmpdir)
+        self.FLAGS = flag.GlobalFlagSet()
+        self.FLAGS.namespace('__main__').verbose = flag.Bool('be verbose')
+        self.FLAGS.namespace('__main__').env = flag.String('environment', 'dev')
+        self.commands = subcommand.Subcommands(self.FLAGS)
+        self.commands.add('deploy', ['subcommand_test_deploy'], 'deploy a release')
+        self.commands.add('migrate', ['subcommand_test_migrate'], 'run migrations')
+
+    def tearDown(self):
+        sys.path.remove(self.tmpdir)
+        for name in ('subcommand_test_deploy', 'subcommand_test_migrate'):
+            sys.modules.pop(name, None)
+        shutil.rmtree(self.tmpdir)
+
+    def test_lazy_import(self):
+        globalflags = flag.GLOBAL_FLAGS
+        name, flags = self.commands.parse(['--env=prod', 'migrate', '--steps', '3', 'x'])
+        self.assertEqual(name, 'migrate')
+        self.assertEqual(flags.args, ['x'])
+        self.assertEqual(flags.namespace('subcommand_test_migrate').steps, 3)
+        self.assertEqual(self.FLAGS.namespace('__main__').env, 'prod')
+        self.assertNotIn('subcommand_test_deploy', sys.modules)
+        self.assertNotIn('subcommand_test_migrate', self.FLAGS.namespace_flags)
+        self.assertIs(flag.GLOBAL_FLAGS, globalflags)
+
+    def test_inherited_flags(self):
+        _, flags = self.commands.parse(['deploy', '--release=v1', '--env=prod'])
+        self.assertEqual(self.FLAGS.namespace('__main__').env, 'prod')
+        self.assertEqual(flags.namespace('subcommand_test_deploy').release, 'v1')
+        self.assertEqual(flags.check_required(), [])
+        # verbose is declared globally and by the subcommand.
+        with self.assertRaises(KeyError):
+            flags.parse_commandline(['--verbose'])
+        flags.parse_commandline(['--__main__.verbose'])
+        self.assertTrue(self.FLAGS.namespace('__main__').verbose)
+
+    def test_required(self):
+        self.FLAGS.namespace('__main__').token = flag.String('api token', flag.REQUIRED)
+        flags = self.commands.flagset('deploy')
+        self.assertIs(self.commands.flagset('deploy'), flags)
+        self.assertEqual([entry[:2] for entry in flags.check_required()], [
+            ('__main__', 'token'), ('subcommand_test_deploy', 'release')])
+        flags.parse_commandline(['--token=secret'])
+        self.assertEqual([entry[:2] for entry in self.FLAGS.check_required()], [])
+
+    def test_unknown_subcommand(self):
+        with self.assertRaises(flag.ParseException):
+            self.commands.parse(['--env=prod'])
+        with self.assertRaises(flag.ParseException):
+            self.commands.parse(['rollback'])
+
+    def test_usage(self):
+        out = six.StringIO()
+        self.commands.write_usage(out)
+        self.assertEqual(out.getvalue(),
+                         '    deploy: deploy a release\n    migrate: run migrations\n')
+        out = six.StringIO()
+        self.commands.flagset('migrate').write_flags_long(out)
+        self.assertIn('__main__:\n', out.getvalue())
+        self.assertIn('subcommand_test_migrate:\n', out.getvalue())
+
+
+if __name__ == '__main__':
+    unittest.main()